@@ -1,25 +1,133 @@
 import streamlit as st
-import json
+import hmac
+import html
+import os
+import threading
 import time
+from collections import OrderedDict
 
-MOCK_USERS = {
-    "123456789": {
-        "name": "King Arthur",
-        "bsn": "123456789",
-        "company": "Camelot Enterprises B.V.",
-        "kvk": "88776655",
-        "business_type": "SME",
-        "stage": "Growth",
-        "location": "Den Haag",
-        "employees": 25,
-        "annual_revenue": 1200000,
-        "sector": "Government & Leadership",
-        "email": "king.arthur@camelot.nl",
-        "phone": "+31 6 1234 5678",
-        "address": "Ridderzaal 1, 2511 CR Den Haag"
-    }
+from applications import ApplicationLog
+from identity import (
+    AUTHENTICATED,
+    CONNECTING,
+    DEMO_BSN,
+    FAILED,
+    LOCAL_USERS,
+    REDIRECTING,
+    LocalIdentityProvider,
+    advance_login,
+)
+from match_cache import MatchCache
+from metrics import METRICS
+from matching import (
+    MatchingEngine,
+    filter_program_id_array,
+    normalize_filters,
+    profile_fingerprint,
+    ranked_page,
+    score_programs,
+    search_program_ids,
+)
+from profiles import ProfileStore
+
+# Count markdown emissions of sampled runs
+METRICS.count_calls(st, "markdown")
+
+ADMIN_HISTORY = 20
+
+# The admin panel is off unless the server sets ADMIN_TOKEN; it is then
+# shown to requests carrying ?admin=<token>
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+def admin_panel_enabled():
+    token = st.query_params.get("admin")
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def admin_panel():
+    """Timing breakdown of the last sampled runs, shown in the sidebar with ?admin=<ADMIN_TOKEN>"""
+    with st.sidebar.expander("⏱️ Laatste runs", expanded=False):
+        records = METRICS.recent(ADMIN_HISTORY)
+        if not records:
+            st.caption("Nog geen runs gemeten")
+            return
+        st.dataframe([
+            {
+                "tijd": time.strftime("%H:%M:%S", time.localtime(record["time"])),
+                "run": record["kind"],
+                "totaal ms": round(record["total"] * 1000, 1),
+                **{f"{name} ms": round(seconds * 1000, 1) for name, seconds in record["timings"].items()},
+                **record["counts"],
+            }
+            for record in records
+        ], hide_index=True)
+
+LOGIN_MESSAGES = {
+    REDIRECTING: "Doorverwijzen naar DigiD...",
+    CONNECTING: "Verbinding met DigiD servers...",
 }
 
+PROFILES_PATH = "profiles.db"
+
+@st.cache_resource
+def get_profile_store():
+    store = ProfileStore(PROFILES_PATH)
+    store.seed(LOCAL_USERS)
+    return store
+
+@st.cache_resource
+def get_identity_provider():
+    return LocalIdentityProvider(get_profile_store())
+
+@st.cache_resource
+def get_match_cache():
+    profiles = get_profile_store()
+    catalogues = get_catalogue_store()
+    cache = MatchCache(
+        score_programs,
+        profile_fingerprint,
+        profiles.get,
+    )
+    catalogues.subscribe(cache.catalogue_changed)
+    profiles.subscribe(lambda bsn: cache.profile_changed(bsn, catalogues.current()))
+    return cache
+
+# One log per process; the launcher gives every worker its own
+APPLICATIONS_PATH = os.environ.get("APPLICATIONS_PATH", "applications.jsonl")
+
+@st.cache_resource
+def get_application_log():
+    return ApplicationLog(APPLICATIONS_PATH)
+
+def current_user():
+    """Profile of the logged-in user, looked up by the key held in session state"""
+    return get_profile_store().get(st.session_state.user_key)
+
+@st.fragment(run_every=0.5)
+@METRICS.runs("login_progress", force=admin_panel_enabled)
+def login_progress():
+    """Advance the pending DigiD handshake, polling again while the provider waits"""
+    handshake_id = st.session_state.get('login_handshake')
+    if handshake_id is None:
+        return
+    
+    provider = get_identity_provider()
+    status = advance_login(provider, handshake_id)
+    
+    if status.state == AUTHENTICATED:
+        del st.session_state['login_handshake']
+        st.session_state.logged_in = True
+        st.session_state.user_key = status.bsn
+        st.session_state.auth_source = provider.name
+        st.session_state.auth_time = status.auth_time
+        st.session_state.auth_verified = True
+        st.rerun()
+    elif status.state == FAILED:
+        del st.session_state['login_handshake']
+        st.error("Authenticatie mislukt, probeer het opnieuw.")
+    else:
+        st.info(LOGIN_MESSAGES[status.state])
+
+@METRICS.timed("digid_login")
 def digid_login():
     """DigiD authentication interface"""
     st.sidebar.header("DigiD Inloggen")
@@ -32,35 +140,21 @@ def digid_login():
         st.sidebar.info("Log in met DigiD voor toegang tot gepersonaliseerde overheidsprogramma's")
         
         if st.sidebar.button("Inloggen met DigiD", type="primary", use_container_width=True):
+            st.session_state.login_handshake = get_identity_provider().start(DEMO_BSN)
+        
+        if 'login_handshake' in st.session_state:
             with st.sidebar:
-                st.info("Doorverwijzen naar DigiD...")
-                time.sleep(0.5)
-                st.success("Verbinding met DigiD servers...")
-                time.sleep(0.5)
-                st.success("Authenticatie succesvol!")
-            
-            king_arthur_data = MOCK_USERS["123456789"].copy()
-            king_arthur_data.update({
-                "auth_method": "DigiD",
-                "auth_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "verified": True
-            })
-            
-            st.session_state.logged_in = True
-            st.session_state.user_data = king_arthur_data
-            st.session_state.auth_source = "DigiD"
-            
-            st.rerun()
+                login_progress()
         
         st.sidebar.caption("💡 **DigiD Demo** - Inloggen als King Arthur")
             
     else:
-        user = st.session_state.user_data
+        user = current_user()
         auth_source = st.session_state.get('auth_source', 'Demo')
         
         if auth_source == 'DigiD':
             st.sidebar.success(f"🔐 DigiD Authentiek: {user['name']}")
-            st.sidebar.caption(f"Geauthenticeerd om {user.get('auth_time', 'onbekend')}")
+            st.sidebar.caption(f"Geauthenticeerd om {st.session_state.get('auth_time', 'onbekend')}")
         else:
             st.sidebar.success(f"✅ Demo Ingelogd: {user['name']}")
             
@@ -79,157 +173,379 @@ def digid_login():
                 st.write(f"**🏠 Adres:** {user['address']}")
         
         if auth_source == 'DigiD':
-            if user.get('verified', False):
+            if st.session_state.get('auth_verified', False):
                 st.sidebar.success("✅ Geverifieerd via DigiD")
             st.sidebar.info("🔒 Gegevens uit overheidsregisters")
         else:
             st.sidebar.info("🎭 Demo account")
         
         if st.sidebar.button("🚪 Uitloggen"):
-            for key in ['logged_in', 'user_data', 'auth_source']:
+            for key in ['logged_in', 'user_key', 'auth_source', 'auth_time', 'auth_verified', 'login_handshake']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
 
-@st.cache_data
-def load_programs():
-    with open("data.json", "r", encoding="utf-8") as f:
-        return json.load(f)
+# The catalogue is edited as JSON. With CATALOGUE_BINARY_PATH set (the
+# launcher sets data.bin) every version of it is converted to that
+# memory-mapped file and read from there.
+CATALOGUE_PATH = os.environ.get("CATALOGUE_PATH", "data.json")
+CATALOGUE_BINARY_PATH = os.environ.get("CATALOGUE_BINARY_PATH") or None
+
+@st.cache_resource
+def get_matching_engine():
+    return MatchingEngine.from_path(CATALOGUE_PATH, CATALOGUE_BINARY_PATH)
 
-def filter_programs(programs, user_data, filters=None):
-    """Filter programs based on user criteria and additional filters"""
-    if not filters:
-        return programs
+def get_catalogue_store():
+    return get_matching_engine().store
+
+class LRUCache:
+    """Bounded LRU cache with hit/miss counters"""
     
-    all_default = all(
-        not filters.get(key) or filters.get(key) in ['Все', 'Alle niveaus', 'Alle rechtsvormen', 'Alle leeftijden', 'Alle groottes', 'Alle statussen', 'Alle uitgaven']
-        for key in ['income_level', 'filing_status', 'household_size', 'age_range', 'employment_status', 'expense_type']
-    )
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key, compute):
+        with self.lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        
+        value = compute()
+        with self.lock:
+            self.misses += 1
+            self.entries[key] = value
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return value
+
+@st.cache_resource
+def get_filter_cache():
+    """Filter results, shared by all sessions and reruns
+
+    They depend only on the catalogue, the filters and the profile values
+    eligibility reads, so a few id arrays serve everyone.
+    """
+    return LRUCache(maxsize=8)
+
+@METRICS.timed("filter_programs")
+def cached_filter_program_ids(index, version, user_data, filters=None):
+    """Id array of the programs passing the filters, memoized on catalogue version, filters and eligibility"""
+    key = (version, normalize_filters(filters), index['eligibility'].profile_key(user_data))
+    return get_filter_cache().get(key, lambda: filter_program_id_array(index, filters, user_data))
+
+MATCH_BANDS = [
+    # (minimum score, badge background, badge text, accent colour)
+    (80, "#d4edda", "#155724", "#28a745"),
+    (60, "#fff3cd", "#856404", "#ffc107"),
+    (0, "#f8f9fa", "#6c757d", "#dee2e6"),
+]
+
+MATCH_SCORE_PLACEHOLDER = "__MATCH_SCORE__"
+
+@st.cache_resource
+def get_card_cache():
+    """Program card HTML, shared by all sessions and reruns"""
+    return LRUCache(maxsize=4096)
+
+def match_band(match_score):
+    """Index into MATCH_BANDS for a match score"""
+    for band, (minimum, *_) in enumerate(MATCH_BANDS):
+        if match_score >= minimum:
+            return band
+    return len(MATCH_BANDS) - 1
+
+def program_card_template(program, band):
+    """HTML of one program card, with a placeholder for the match score
+    
+    The HTML is kept free of blank lines and indentation so markdown renders
+    it as a single HTML block.
+    """
+    _, match_color, match_text_color, border_color = MATCH_BANDS[band]
+    program_name = html.escape(program.get('long_name', program.get('short_name', 'Onbekende programma')))
+    short_name = html.escape(program.get('short_name', 'N/A'))
+    description = html.escape(program.get('description', 'Geen beschrijving beschikbaar'))
+    
+    parts = [
+        f'<div style="background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%); padding: 2rem; border-radius: 16px; border-left: 5px solid {border_color}; margin: 1.5rem 0; box-shadow: 0 4px 6px rgba(0,0,0,0.07), 0 1px 3px rgba(0,0,0,0.06);">',
+        '<div style="display: flex; align-items: center; margin-bottom: 0.5rem;">',
+        f'<span style="background: {border_color}; color: white; padding: 0.25rem 0.75rem; border-radius: 20px; font-size: 0.75rem; font-weight: bold; margin-right: 1rem;">{short_name}</span>',
+        f'<span style="background: {match_color}; color: {match_text_color}; padding: 0.25rem 0.75rem; border-radius: 20px; font-size: 0.85rem; font-weight: bold;">🎯 {MATCH_SCORE_PLACEHOLDER}% match</span>',
+        '</div>',
+        f'<h3 style="color: #154c79; margin: 0; font-size: 1.3rem; font-weight: 600;">{program_name}</h3>',
+        '</div>',
+        '<div style="background: #f8f9fa; padding: 1.2rem; border-radius: 12px; margin: 1rem 0; border-left: 4px solid #007bff;">',
+        '<h5 style="color: #154c79; margin-bottom: 0.8rem; display: flex; align-items: center;">📄 <span style="margin-left: 0.5rem;">Beschrijving</span></h5>',
+        f'<p style="margin: 0; color: #495057; line-height: 1.6;">{description}</p>',
+        '</div>',
+    ]
+    
+    criteria_list = program.get('criteria', [])
+    if criteria_list:
+        parts.append('<h5 style="color: #154c79; margin: 1.5rem 0 1rem 0; display: flex; align-items: center;">✅ <span style="margin-left: 0.5rem;">Geschiktheidscriteria</span></h5>')
+        for criterion in criteria_list[:4]:
+            parts.append(
+                '<div style="background: #e8f5e8; padding: 0.8rem 1.2rem; margin: 0.5rem 0; border-radius: 8px; border-left: 3px solid #28a745;">'
+                f'<span style="color: #155724; font-weight: 500;">✓ {html.escape(criterion)}</span></div>'
+            )
+        if len(criteria_list) > 4:
+            parts.append(f"<p style='color: #6c757d; font-style: italic; margin: 0.5rem 0;'>...en nog {len(criteria_list)-4} andere criteria</p>")
+    
+    benefits_list = program.get('benefits', [])
+    if benefits_list:
+        parts.append('<h5 style="color: #154c79; margin: 1.5rem 0 1rem 0; display: flex; align-items: center;">💰 <span style="margin-left: 0.5rem;">Belangrijkste voordelen</span></h5>')
+        for benefit in benefits_list[:4]:
+            parts.append(
+                '<div style="background: #fff3cd; padding: 0.8rem 1.2rem; margin: 0.5rem 0; border-radius: 8px; border-left: 3px solid #ffc107;">'
+                f'<span style="color: #856404; font-weight: 500;">🎁 {html.escape(benefit)}</span></div>'
+            )
+        if len(benefits_list) > 4:
+            parts.append(f"<p style='color: #6c757d; font-style: italic; margin: 0.5rem 0;'>...en nog {len(benefits_list)-4} andere voordelen</p>")
+    
+    return '\n'.join(parts)
+
+@METRICS.timed("render")
+def render_program_card(version, program_id, program, match_score):
+    """HTML of a program card, cached per catalogue version, program and score band"""
+    band = match_band(match_score)
+    template = get_card_cache().get((version, program_id, band), lambda: program_card_template(program, band))
+    return template.replace(MATCH_SCORE_PLACEHOLDER, str(match_score))
+
+AUTOCOMPLETE_LIMIT = 6
+
+def use_suggestion(name):
+    st.session_state.search_query = name
+
+def program_autocomplete():
+    """Sidebar lookup of programs by name or acronym, typos allowed, feeding the search box"""
+    prefix = st.sidebar.text_input("Regeling opzoeken", key="autocomplete_prefix",
+                                   placeholder="Bijv. WBSO, SDE++, innovatie")
+    if not prefix.strip():
+        return
     
-    if all_default:
-        return programs
+    index = get_catalogue_store().current().index
+    with METRICS.timer("autocomplete"):
+        suggestions = index['autocomplete'].lookup(prefix, limit=2 * AUTOCOMPLETE_LIMIT)
+    
+    # Programs listed twice in the catalogue share a name; show it once
+    names = list(dict.fromkeys(name for _, _, name, _ in suggestions))[:AUTOCOMPLETE_LIMIT]
+    if not names:
+        st.sidebar.caption("Geen regelingen gevonden")
+    for i, name in enumerate(names):
+        st.sidebar.button(name, key=f"suggestion_{i}", on_click=use_suggestion, args=(name,),
+                          use_container_width=True)
+
+def go_to_page(page_num):
+    st.session_state.current_page = page_num
+
+def render_pagination(total_pages, position):
+    """Previous/next buttons and page numbers; position keeps widget keys unique"""
+    current_page = st.session_state.current_page
+    col_prev, col_pages, col_next = st.columns([1, 3, 1])
     
-    filtered = []
+    with col_prev:
+        st.button("⬅️ Vorige", disabled=(current_page <= 1), key=f"prev_{position}",
+                  help="Ga naar vorige pagina", on_click=go_to_page, args=(current_page - 1,))
     
-    for program in programs:
-        include_program = True
+    with col_pages:
+        visible_pages = min(7, total_pages)  # Show max 7 page buttons
+        start_page = max(1, current_page - visible_pages // 2)
+        end_page = min(total_pages, start_page + visible_pages - 1)
         
-        program_text = ' '.join([
-            program.get('short_name', '').lower(),
-            program.get('long_name', '').lower(),
-            program.get('description', '').lower(),
-            ' '.join(program.get('criteria', [])).lower(),
-            ' '.join(program.get('benefits', [])).lower()
-        ])
+        if end_page - start_page < visible_pages - 1:
+            start_page = max(1, end_page - visible_pages + 1)
         
-        filters_passed = 0
-        total_active_filters = 0
+        page_cols = st.columns(end_page - start_page + 1)
         
-        if filters.get('income_level') and 'laag inkomen' in filters.get('income_level', '').lower():
-            total_active_filters += 1
-            income_keywords = ['klein', 'start', 'beperkt', 'minimaal', 'zzp', 'starter']
-            if any(keyword in program_text for keyword in income_keywords):
-                filters_passed += 1
-        elif filters.get('income_level') and 'midden inkomen' in filters.get('income_level', '').lower():
-            total_active_filters += 1  
-            income_keywords = ['mkb', 'midden', 'gemiddeld', 'groei', 'ontwikkeling']
-            if any(keyword in program_text for keyword in income_keywords):
-                filters_passed += 1
-        elif filters.get('income_level') and 'hoog inkomen' in filters.get('income_level', '').lower():
-            total_active_filters += 1
-            income_keywords = ['groot', 'hoog', 'scale', 'export', 'internationaal', 'aanzienlijk']
-            if any(keyword in program_text for keyword in income_keywords):
-                filters_passed += 1
+        for i, page_num in enumerate(range(start_page, end_page + 1)):
+            with page_cols[i]:
+                if page_num == current_page:
+                    st.markdown(f"""
+                    <div style="background: linear-gradient(135deg, #007bff, #0056b3); 
+                                color: white; 
+                                padding: 0.7rem 1rem; 
+                                text-align: center; 
+                                border-radius: 8px; 
+                                font-weight: bold;
+                                font-size: 1rem;
+                                box-shadow: 0 2px 8px rgba(0,123,255,0.3);
+                                border: 2px solid #007bff;
+                                margin: 0 0.1rem;">
+                        {page_num}
+                    </div>
+                    """, unsafe_allow_html=True)
+                else:
+                    st.button(f"{page_num}", key=f"page_{page_num}_{position}",
+                              help=f"Ga naar pagina {page_num}", use_container_width=True,
+                              on_click=go_to_page, args=(page_num,))
+    
+    with col_next:
+        st.button("Volgende ➡️", disabled=(current_page >= total_pages), key=f"next_{position}",
+                  help="Ga naar volgende pagina", on_click=go_to_page, args=(current_page + 1,))
+
+@st.fragment
+@METRICS.runs("results_fragment", force=admin_panel_enabled)
+def results_fragment(catalogue, matched_ids, cursor):
+    """Ranked result list with pagination, rerun on its own when its buttons are used"""
+    version = catalogue.version
+    programs = catalogue.programs
+    
+    if len(matched_ids):
+        programs_per_page = 3
+        total_programs = len(matched_ids)
+        total_pages = (total_programs + programs_per_page - 1) // programs_per_page
+        
+        if 'current_page' not in st.session_state:
+            st.session_state.current_page = 1
+        
+        st.markdown(f"""
+        <div style="background: white; padding: 1.5rem; border-radius: 10px; border: 1px solid #d4edda; margin: 1.5rem 0;">
+            <div style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap;">
+                <div>
+                    <h4 style="color: #155724; margin: 0;">📋 {total_programs} geschikte programma's gevonden</h4>
+                    <p style="color: #155724; margin: 0.5rem 0 0 0; opacity: 0.8;">Deze programma's passen perfect bij uw bedrijfsprofiel en geselecteerde criteria</p>
+                </div>
+                <div style="text-align: right;">
+                    <span style="color: #6c757d; font-size: 0.9rem; background: #f8f9fa; padding: 0.3rem 0.8rem; border-radius: 20px;">
+                        📄 Pagina {st.session_state.current_page} van {total_pages}
+                    </span>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
         
-        if filters.get('filing_status') and 'bedrijf' in filters.get('filing_status', '').lower():
-            total_active_filters += 1
-            business_keywords = ['bedrijf', 'onderneming', 'mkb', 'bv', 'commercieel', 'zakelijk', 'fiscaal']
-            if any(keyword in program_text for keyword in business_keywords):
-                filters_passed += 1
-        elif filters.get('filing_status') and 'particulier' in filters.get('filing_status', '').lower():
-            total_active_filters += 1
-            personal_keywords = ['particulier', 'persoon', 'individueel', 'privé', 'eigen']
-            if any(keyword in program_text for keyword in personal_keywords):
-                filters_passed += 1
+        if total_pages > 1:
+            render_pagination(total_pages, "top")
+            st.markdown("<br>", unsafe_allow_html=True)
         
-        if filters.get('employment_status') and 'zelfstandig' in filters.get('employment_status', '').lower():
-            total_active_filters += 1
-            entrepreneur_keywords = ['zelfstandig', 'ondernemer', 'eigenaar', 'zzp', 'freelance']
-            if any(keyword in program_text for keyword in entrepreneur_keywords):
-                filters_passed += 1
+        start_idx = (st.session_state.current_page - 1) * programs_per_page
+        end_idx = min(start_idx + programs_per_page, total_programs)
+        with METRICS.timer("rank"):
+            current_page_ids = ranked_page(cursor, matched_ids, start_idx, end_idx)
         
-        if filters.get('expense_type') and 'bedrijf' in filters.get('expense_type', '').lower():
-            total_active_filters += 1
-            business_expense_keywords = ['bedrijf', 'zakelijk', 'commercieel', 'investering', 'operationeel']
-            if any(keyword in program_text for keyword in business_expense_keywords):
-                filters_passed += 1
-        elif filters.get('expense_type') and 'apparatuur' in filters.get('expense_type', '').lower():
-            total_active_filters += 1
-            equipment_keywords = ['apparatuur', 'machines', 'technologie', 'installatie', 'hardware', 'middelen']
-            if any(keyword in program_text for keyword in equipment_keywords):
-                filters_passed += 1
-        elif filters.get('expense_type') and 'training' in filters.get('expense_type', '').lower():
-            total_active_filters += 1
-            training_keywords = ['training', 'opleiding', 'scholing', 'ontwikkeling', 'kennis', 'cursus']
-            if any(keyword in program_text for keyword in training_keywords):
-                filters_passed += 1
-        elif filters.get('expense_type') and 'onderzoek' in filters.get('expense_type', '').lower():
-            total_active_filters += 1
-            research_keywords = ['onderzoek', 'ontwikkeling', 'innovatie', 'r&d', 'speur', 'technisch']
-            if any(keyword in program_text for keyword in research_keywords):
-                filters_passed += 1
+        for i, program_id in enumerate(current_page_ids):
+            program = programs[program_id]
+            match_score = int(cursor['scores'][program_id])
+            
+            with st.container():
+                col_a, col_b = st.columns([3, 1])
+                
+                with col_a:
+                    st.markdown(render_program_card(version, program_id, program, match_score), unsafe_allow_html=True)
+                
+                with col_b:
+                    program_key = f"{program.get('short_name', 'program').replace(' ', '_').replace('(', '').replace(')', '')}_{i}"
+                    
+                    st.markdown(f"""
+                    <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 12px; border: 1px solid #dee2e6; margin-top: 1rem; text-align: center;">
+                        <h6 style="color: #495057; margin-bottom: 1rem;">Actie ondernemen</h6>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    
+                    if st.button("🚀 Subsidie Aanvragen", key=f"apply_{program_key}", type="primary", use_container_width=True):
+                        get_application_log().submit("application", current_user()['kvk'], program.get('short_name', 'N/A'))
+                        st.success("🎉 Uw aanvraag is succesvol ingediend!")
+                        st.info("📧 U ontvangt binnen 2 werkdagen een bevestigingsmail met verdere instructies.")
+                        st.balloons()
+                    
+                    if st.button("📚 Meer Informatie", key=f"info_{program_key}", use_container_width=True):
+                        st.info("📞 Voor meer informatie kunt u contact opnemen met Nederlandse overheid of bezoek de officiële website.")
+                    
+                    st.markdown(f"""
+                    <div style="background: #e9ecef; padding: 1rem; border-radius: 8px; margin: 1rem 0;">
+                        <small style="color: #6c757d;">
+                            <strong>Uitvoerder:</strong><br>Nederlandse overheid<br><br>
+                            <strong>Status:</strong><br>✅ Actief programma<br><br>
+                            <strong>Type:</strong><br>📋 Overheidssubsidie
+                        </small>
+                    </div>
+                    """, unsafe_allow_html=True)
+            
+            st.markdown("---")
         
-        if total_active_filters == 0 or filters_passed > 0:
-            filtered.append(program)
+        if total_pages > 1:
+            st.markdown("<br>", unsafe_allow_html=True)
+            render_pagination(total_pages, "bottom")
+            
+            st.markdown(f"""
+            <div style="text-align: center; margin: 1rem 0; color: #6c757d;">
+                <small>
+                    📄 Toont programma's {start_idx + 1}-{end_idx} van {total_programs} totaal | 
+                    📊 {programs_per_page} programma's per pagina
+                </small>
+            </div>
+            """, unsafe_allow_html=True)
     
-    return filtered
+    else:
+        st.markdown("""
+        <div style="background: white; padding: 2rem; border-radius: 12px; border: 1px solid #ffeaa7; margin: 1.5rem 0; text-align: center;">
+            <h4 style="color: #856404; margin: 0 0 1rem 0;">🔍 Geen geschikte programma's gevonden</h4>
+            <p style="color: #856404; margin: 0;">Met uw huidige criteria en filters zijn er momenteel geen passende subsidies beschikbaar.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        st.markdown("### 💡 Wat kunt u doen?")
+        col_tip1, col_tip2, col_tip3 = st.columns(3)
+        
+        with col_tip1:
+            st.markdown("""
+            **🔄 Pas filters aan**  
+            Probeer minder specifieke criteria of verwijder enkele filters om meer resultaten te krijgen.
+            """)
+        
+        with col_tip2:
+            st.markdown("""
+            **📞 Persoonlijk advies**  
+            Neem contact op met onze specialisten voor maatwerk subsidieadvies.
+            """)
+        
+        with col_tip3:
+            st.markdown("""
+            **🔔 Notificaties**  
+            Meld u aan voor updates over nieuwe programma's die bij uw profiel passen.
+            """)
 
-def calculate_match_score(program, user_data):
-    """Calculate match percentage for a program"""
-    score = 0
-    max_score = 5
-    
-    program_text = ' '.join([
-        program.get('short_name', '').lower(),
-        program.get('long_name', '').lower(), 
-        program.get('description', '').lower(),
-        ' '.join(program.get('criteria', [])).lower(),
-        ' '.join(program.get('benefits', [])).lower()
-    ])
-    
-    if user_data.get('business_type') == 'SME':
-        business_keywords = ['mkb', 'bedrijf', 'onderneming', 'commerci']
-        if any(keyword in program_text for keyword in business_keywords):
-            score += 1
-    
-    user_sector = user_data.get('sector', '').lower()
-    if 'government' in user_sector or 'leadership' in user_sector:
-        gov_keywords = ['overheid', 'publiek', 'bestuur', 'regering']
-        if any(keyword in program_text for keyword in gov_keywords):
-            score += 1
-    elif 'technology' in user_sector:
-        tech_keywords = ['technologie', 'innovatie', 'digitaal', 'r&d', 'ontwikkeling']
-        if any(keyword in program_text for keyword in tech_keywords):
-            score += 1
+@st.fragment(run_every="30s")
+@METRICS.runs("dashboard_metrics", force=admin_panel_enabled)
+def dashboard_metrics(user):
+    """Catalogue and match counts, refreshed on their own to follow catalogue reloads"""
+    catalogue = get_catalogue_store().current()
+    version = catalogue.version
+    programs = catalogue.programs
     
-    employees = user_data.get('employees', 0)
-    if 10 <= employees <= 50:
-        size_keywords = ['mkb', 'midden', 'groei', 'kleinschalig']
-        if any(keyword in program_text for keyword in size_keywords):
-            score += 1
+    total_programs = len(programs)
+    matched_count = len(cached_filter_program_ids(catalogue.index, version, user))
+    match_percentage = int((matched_count / total_programs) * 100) if total_programs > 0 else 0
     
-    revenue = user_data.get('annual_revenue', 0)
-    if revenue >= 500000:
-        revenue_keywords = ['hoog', 'groot', 'aanzienlijk', 'substantieel']
-        if any(keyword in program_text for keyword in revenue_keywords):
-            score += 1
+    col_met1, col_met2 = st.columns(2)
+    with col_met1:
+        st.markdown(f"""
+        <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #dee2e6;">
+            <div style="font-size: 1.5rem; font-weight: bold; color: #154c79;">{total_programs}</div>
+            <div style="color: #666; font-size: 0.85rem;">Beschikbare programma's</div>
+        </div>
+        """, unsafe_allow_html=True)
     
-    general_keywords = ['subsidie', 'financiering', 'ondersteuning', 'stimulering', 'aftrek']
-    if any(keyword in program_text for keyword in general_keywords):
-        score += 1
+    with col_met2:
+        st.markdown(f"""
+        <div style="background: #e8f5e8; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #c3e6cb;">
+            <div style="font-size: 1.5rem; font-weight: bold; color: #155724;">{matched_count}</div>
+            <div style="color: #155724; font-size: 0.85rem;">Voor u geschikt</div>
+        </div>
+        """, unsafe_allow_html=True)
     
-    return max(25, int((score / max_score) * 100))  # Minimum 25% match
+    st.markdown(f"""
+    <div style="background: #fff3cd; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #ffeaa7; margin-top: 0.5rem;">
+        <div style="font-size: 1.5rem; font-weight: bold; color: #856404;">{match_percentage}%</div>
+        <div style="color: #856404; font-size: 0.85rem;">Match percentage</div>
+    </div>
+    """, unsafe_allow_html=True)
 
+@METRICS.runs("script", force=admin_panel_enabled)
 def main():
     st.set_page_config(
         page_title="Ondernemersloket Nederland", 
@@ -253,6 +569,10 @@ def main():
     """, unsafe_allow_html=True)
     
     digid_login()
+    if st.session_state.get('logged_in', False):
+        program_autocomplete()
+    if admin_panel_enabled():
+        admin_panel()
     
     st.markdown("""
     <div style="background: linear-gradient(90deg, #154c79 0%, #1e5f8b 100%); padding: 2rem; border-radius: 12px; margin-bottom: 2rem; box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);">
@@ -268,7 +588,10 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    programs = load_programs()
+    with METRICS.timer("load_programs"):
+        catalogue = get_catalogue_store().current()
+    version = catalogue.version
+    programs = catalogue.programs
     
     if not st.session_state.get('logged_in', False):
         
@@ -341,7 +664,15 @@ def main():
             """, unsafe_allow_html=True)
     
     else:
-        user = st.session_state.user_data
+        user = current_user()
+        
+        # Scores may briefly lag a catalogue reload; render against the catalogue they belong to
+        with METRICS.timer("calculate_match_score"):
+            match = get_match_cache().get(user.key, user, catalogue)
+        catalogue = match.catalogue
+        version = catalogue.version
+        programs = catalogue.programs
+        
         st.markdown(f"""
         <div style="background: linear-gradient(90deg, #d4edda 0%, #c3e6cb 100%); padding: 1.5rem; border-radius: 10px; border: 1px solid #c3e6cb; margin: 1.5rem 0;">
             <h4 style="color: #155724; margin: 0;">Welkom, {user['name']}</h4>
@@ -354,6 +685,13 @@ def main():
         with col1:
             st.markdown("## Gepersonaliseerde Programma's voor uw Bedrijf")
             
+            query = st.text_input(
+                "Zoeken",
+                key="search_query",
+                placeholder="Zoek op trefwoord, bijv. warmtepomp subsidie",
+                help="Doorzoekt naam, beschrijving, criteria en voordelen van alle programma's",
+            ).strip()
+            
             st.markdown("""
             <div style="background: white; padding: 2rem; border-radius: 12px; border: 1px solid #e0e0e0; margin: 1.5rem 0;">
                 <h3 style="color: #154c79; margin: 0 0 1.5rem 0; font-weight: 600;">Programma Filters</h3>
@@ -485,7 +823,21 @@ def main():
                 'expense_type': 'business' if 'Bedrijfskosten' in expense_type else 'personal' if 'Persoonlijke' in expense_type else 'equipment' if 'Apparatuur' in expense_type else 'training' if 'Training' in expense_type else 'research' if 'Onderzoek' in expense_type else None,
             }
             
-            matched_programs = filter_programs(programs, user, filters)
+            matched_ids = cached_filter_program_ids(catalogue.index, version, user, filters)
+            if query:
+                # Search narrows the filtered programs and ranks them by relevance
+                narrowed = len(matched_ids) < catalogue.index['size']
+                with METRICS.timer("search"):
+                    matched_ids = search_program_ids(catalogue.index, query, allowed=matched_ids if narrowed else None)
+            # Eligibility reads profile values scoring may not, so they key the cursor too
+            ranking_key = (version, normalize_filters(filters), catalogue.index['eligibility'].profile_key(user), match.fingerprint, query)
+            
+            cursor = st.session_state.get('ranking_cursor')
+            if not cursor or cursor['key'] != ranking_key:
+                # Search results arrive ranked; otherwise ranking happens page by page
+                cursor = {'key': ranking_key, 'ranked': matched_ids if query else [], 'scores': match.scores}
+                st.session_state.ranking_cursor = cursor
+                st.session_state.current_page = 1
             
             active_filters = [k for k, v in filters.items() if v is not None]
             if active_filters:
@@ -495,293 +847,7 @@ def main():
                 </div>
                 """, unsafe_allow_html=True)
             
-            if matched_programs:
-                programs_per_page = 3
-                total_programs = len(matched_programs)
-                total_pages = (total_programs + programs_per_page - 1) // programs_per_page
-                
-                if 'current_page' not in st.session_state:
-                    st.session_state.current_page = 1
-                
-                st.markdown(f"""
-                <div style="background: white; padding: 1.5rem; border-radius: 10px; border: 1px solid #d4edda; margin: 1.5rem 0;">
-                    <div style="display: flex; justify-content: space-between; align-items: center; flex-wrap: wrap;">
-                        <div>
-                            <h4 style="color: #155724; margin: 0;">📋 {total_programs} geschikte programma's gevonden</h4>
-                            <p style="color: #155724; margin: 0.5rem 0 0 0; opacity: 0.8;">Deze programma's passen perfect bij uw bedrijfsprofiel en geselecteerde criteria</p>
-                        </div>
-                        <div style="text-align: right;">
-                            <span style="color: #6c757d; font-size: 0.9rem; background: #f8f9fa; padding: 0.3rem 0.8rem; border-radius: 20px;">
-                                📄 Pagina {st.session_state.current_page} van {total_pages}
-                            </span>
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                if total_pages > 1:
-                    col_prev, col_pages, col_next = st.columns([1, 3, 1])
-                    
-                    with col_prev:
-                        if st.button("⬅️ Vorige", disabled=(st.session_state.current_page <= 1), key="prev_top", 
-                                   help="Ga naar vorige pagina"):
-                            st.session_state.current_page -= 1
-                            st.rerun()
-                    
-                    with col_pages:
-                        visible_pages = min(7, total_pages)  # Show max 7 page buttons
-                        start_page = max(1, st.session_state.current_page - visible_pages // 2)
-                        end_page = min(total_pages, start_page + visible_pages - 1)
-                        
-                        if end_page - start_page < visible_pages - 1:
-                            start_page = max(1, end_page - visible_pages + 1)
-                        
-                        page_cols = st.columns(end_page - start_page + 1)
-                        
-                        for i, page_num in enumerate(range(start_page, end_page + 1)):
-                            with page_cols[i]:
-                                if page_num == st.session_state.current_page:
-                                    st.markdown(f"""
-                                    <div style="background: linear-gradient(135deg, #007bff, #0056b3); 
-                                                color: white; 
-                                                padding: 0.7rem 1rem; 
-                                                text-align: center; 
-                                                border-radius: 8px; 
-                                                font-weight: bold;
-                                                font-size: 1rem;
-                                                box-shadow: 0 2px 8px rgba(0,123,255,0.3);
-                                                border: 2px solid #007bff;
-                                                margin: 0 0.1rem;">
-                                        {page_num}
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                else:
-                                    if st.button(f"{page_num}", key=f"page_{page_num}_top", 
-                                               help=f"Ga naar pagina {page_num}",
-                                               use_container_width=True):
-                                        st.session_state.current_page = page_num
-                                        st.rerun()
-                    
-                    with col_next:
-                        if st.button("Volgende ➡️", disabled=(st.session_state.current_page >= total_pages), key="next_top",
-                                   help="Ga naar volgende pagina"):
-                            st.session_state.current_page += 1
-                            st.rerun()
-                    
-                    st.markdown("<br>", unsafe_allow_html=True)
-                
-                start_idx = (st.session_state.current_page - 1) * programs_per_page
-                end_idx = min(start_idx + programs_per_page, total_programs)
-                current_page_programs = matched_programs[start_idx:end_idx]
-                
-                for i, program in enumerate(current_page_programs):
-                    match_score = calculate_match_score(program, user)
-                    
-                    program_name = program.get('long_name', program.get('short_name', 'Onbekende programma'))
-                    short_name = program.get('short_name', 'N/A')
-                    
-                    if match_score >= 80:
-                        match_color = "#d4edda"
-                        match_text_color = "#155724"
-                        border_color = "#28a745"
-                    elif match_score >= 60:
-                        match_color = "#fff3cd" 
-                        match_text_color = "#856404"
-                        border_color = "#ffc107"
-                    else:
-                        match_color = "#f8f9fa"
-                        match_text_color = "#6c757d"
-                        border_color = "#dee2e6"
-                    
-                    st.markdown(f"""
-                    <div style="background: linear-gradient(135deg, #ffffff 0%, #f8f9fa 100%); 
-                                padding: 2rem; 
-                                border-radius: 16px; 
-                                border-left: 5px solid {border_color}; 
-                                margin: 1.5rem 0; 
-                                box-shadow: 0 4px 6px rgba(0,0,0,0.07), 0 1px 3px rgba(0,0,0,0.06);
-                                transition: all 0.3s ease;">
-                        <div style="display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 1.5rem;">
-                            <div style="flex-grow: 1;">
-                                <div style="display: flex; align-items: center; margin-bottom: 0.5rem;">
-                                    <span style="background: {border_color}; color: white; padding: 0.25rem 0.75rem; border-radius: 20px; font-size: 0.75rem; font-weight: bold; margin-right: 1rem;">
-                                        {short_name}
-                                    </span>
-                                    <span style="background: {match_color}; color: {match_text_color}; padding: 0.25rem 0.75rem; border-radius: 20px; font-size: 0.85rem; font-weight: bold;">
-                                        🎯 {match_score}% match
-                                    </span>
-                                </div>
-                                <h3 style="color: #154c79; margin: 0; font-size: 1.3rem; font-weight: 600;">{program_name}</h3>
-                            </div>
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    with st.container():
-                        col_a, col_b = st.columns([3, 1])
-                        
-                        with col_a:
-                            st.markdown(f"""
-                            <div style="background: #f8f9fa; padding: 1.2rem; border-radius: 12px; margin: 1rem 0; border-left: 4px solid #007bff;">
-                                <h5 style="color: #154c79; margin-bottom: 0.8rem; display: flex; align-items: center;">
-                                    📄 <span style="margin-left: 0.5rem;">Beschrijving</span>
-                                </h5>
-                                <p style="margin: 0; color: #495057; line-height: 1.6;">{program.get('description', 'Geen beschrijving beschikbaar')}</p>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            if program.get('criteria'):
-                                st.markdown("""
-                                <h5 style="color: #154c79; margin: 1.5rem 0 1rem 0; display: flex; align-items: center;">
-                                    ✅ <span style="margin-left: 0.5rem;">Geschiktheidscriteria</span>
-                                </h5>
-                                """, unsafe_allow_html=True)
-                                
-                                criteria_list = program.get('criteria', [])
-                                for i, criterion in enumerate(criteria_list[:4]):
-                                    st.markdown(f"""
-                                    <div style="background: #e8f5e8; padding: 0.8rem 1.2rem; margin: 0.5rem 0; border-radius: 8px; border-left: 3px solid #28a745;">
-                                        <span style="color: #155724; font-weight: 500;">✓ {criterion}</span>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                
-                                if len(criteria_list) > 4:
-                                    st.markdown(f"<p style='color: #6c757d; font-style: italic; margin: 0.5rem 0;'>...en nog {len(criteria_list)-4} andere criteria</p>", unsafe_allow_html=True)
-                            
-                            if program.get('benefits'):
-                                st.markdown("""
-                                <h5 style="color: #154c79; margin: 1.5rem 0 1rem 0; display: flex; align-items: center;">
-                                    💰 <span style="margin-left: 0.5rem;">Belangrijkste voordelen</span>
-                                </h5>
-                                """, unsafe_allow_html=True)
-                                
-                                benefits_list = program.get('benefits', [])
-                                for benefit in benefits_list[:4]:
-                                    st.markdown(f"""
-                                    <div style="background: #fff3cd; padding: 0.8rem 1.2rem; margin: 0.5rem 0; border-radius: 8px; border-left: 3px solid #ffc107;">
-                                        <span style="color: #856404; font-weight: 500;">🎁 {benefit}</span>
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                
-                                if len(benefits_list) > 4:
-                                    st.markdown(f"<p style='color: #6c757d; font-style: italic; margin: 0.5rem 0;'>...en nog {len(benefits_list)-4} andere voordelen</p>", unsafe_allow_html=True)
-                        
-                        with col_b:
-                            program_key = f"{program.get('short_name', 'program').replace(' ', '_').replace('(', '').replace(')', '')}_{i}"
-                            
-                            st.markdown(f"""
-                            <div style="background: #f8f9fa; padding: 1.5rem; border-radius: 12px; border: 1px solid #dee2e6; margin-top: 1rem; text-align: center;">
-                                <h6 style="color: #495057; margin-bottom: 1rem;">Actie ondernemen</h6>
-                            </div>
-                            """, unsafe_allow_html=True)
-                            
-                            if st.button("🚀 Subsidie Aanvragen", key=f"apply_{program_key}", type="primary", use_container_width=True):
-                                st.success("🎉 Uw aanvraag is succesvol ingediend!")
-                                st.info("📧 U ontvangt binnen 2 werkdagen een bevestigingsmail met verdere instructies.")
-                                st.balloons()
-                            
-                            if st.button("📚 Meer Informatie", key=f"info_{program_key}", use_container_width=True):
-                                st.info("📞 Voor meer informatie kunt u contact opnemen met Nederlandse overheid of bezoek de officiële website.")
-                                
-                            st.markdown(f"""
-                            <div style="background: #e9ecef; padding: 1rem; border-radius: 8px; margin: 1rem 0;">
-                                <small style="color: #6c757d;">
-                                    <strong>Uitvoerder:</strong><br>Nederlandse overheid<br><br>
-                                    <strong>Status:</strong><br>✅ Actief programma<br><br>
-                                    <strong>Type:</strong><br>📋 Overheidssubsidie
-                                </small>
-                            </div>
-                            """, unsafe_allow_html=True)
-                    
-                    st.markdown("---")
-                
-                if total_pages > 1:
-                    st.markdown("<br>", unsafe_allow_html=True)
-                    col_prev_b, col_pages_b, col_next_b = st.columns([1, 3, 1])
-                    
-                    with col_prev_b:
-                        if st.button("⬅️ Vorige", disabled=(st.session_state.current_page <= 1), key="prev_bottom",
-                                   help="Ga naar vorige pagina"):
-                            st.session_state.current_page -= 1
-                            st.rerun()
-                    
-                    with col_pages_b:
-                        visible_pages = min(7, total_pages)
-                        start_page = max(1, st.session_state.current_page - visible_pages // 2)
-                        end_page = min(total_pages, start_page + visible_pages - 1)
-                        
-                        if end_page - start_page < visible_pages - 1:
-                            start_page = max(1, end_page - visible_pages + 1)
-                        
-                        page_cols_b = st.columns(end_page - start_page + 1)
-                        
-                        for i, page_num in enumerate(range(start_page, end_page + 1)):
-                            with page_cols_b[i]:
-                                if page_num == st.session_state.current_page:
-                                    st.markdown(f"""
-                                    <div style="background: linear-gradient(135deg, #007bff, #0056b3); 
-                                                color: white; 
-                                                padding: 0.7rem 1rem; 
-                                                text-align: center; 
-                                                border-radius: 8px; 
-                                                font-weight: bold;
-                                                font-size: 1rem;
-                                                box-shadow: 0 2px 8px rgba(0,123,255,0.3);
-                                                border: 2px solid #007bff;
-                                                margin: 0 0.1rem;">
-                                        {page_num}
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                                else:
-                                    if st.button(f"{page_num}", key=f"page_{page_num}_bottom",
-                                               help=f"Ga naar pagina {page_num}",
-                                               use_container_width=True):
-                                        st.session_state.current_page = page_num
-                                        st.rerun()
-                    
-                    with col_next_b:
-                        if st.button("Volgende ➡️", disabled=(st.session_state.current_page >= total_pages), key="next_bottom",
-                                   help="Ga naar volgende pagina"):
-                            st.session_state.current_page += 1
-                            st.rerun()
-                    
-                    st.markdown(f"""
-                    <div style="text-align: center; margin: 1rem 0; color: #6c757d;">
-                        <small>
-                            📄 Toont programma's {start_idx + 1}-{end_idx} van {total_programs} totaal | 
-                            📊 {programs_per_page} programma's per pagina
-                        </small>
-                    </div>
-                    """, unsafe_allow_html=True)
-            
-            else:
-                st.markdown("""
-                <div style="background: white; padding: 2rem; border-radius: 12px; border: 1px solid #ffeaa7; margin: 1.5rem 0; text-align: center;">
-                    <h4 style="color: #856404; margin: 0 0 1rem 0;">🔍 Geen geschikte programma's gevonden</h4>
-                    <p style="color: #856404; margin: 0;">Met uw huidige criteria en filters zijn er momenteel geen passende subsidies beschikbaar.</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                st.markdown("### 💡 Wat kunt u doen?")
-                col_tip1, col_tip2, col_tip3 = st.columns(3)
-                
-                with col_tip1:
-                    st.markdown("""
-                    **🔄 Pas filters aan**  
-                    Probeer minder specifieke criteria of verwijder enkele filters om meer resultaten te krijgen.
-                    """)
-                
-                with col_tip2:
-                    st.markdown("""
-                    **📞 Persoonlijk advies**  
-                    Neem contact op met onze specialisten voor maatwerk subsidieadvies.
-                    """)
-                
-                with col_tip3:
-                    st.markdown("""
-                    **🔔 Notificaties**  
-                    Meld u aan voor updates over nieuwe programma's die bij uw profiel passen.
-                    """)
+            results_fragment(catalogue, matched_ids, cursor)
             
             st.markdown("""
             <div style="background: white; padding: 1.5rem; border-radius: 15px; border: 1px solid #ff6b6b; margin: 2rem 0 1rem 0;">
@@ -816,6 +882,7 @@ def main():
                 with col_proj2:
                     st.markdown("<br/>", unsafe_allow_html=True)
                     if st.button("Interesse Tonen", type="primary", use_container_width=True):
+                        get_application_log().submit("interest", user['kvk'], "Warmtenet Den Haag")
                         st.balloons()
                         st.success("Uw interesse is geregistreerd!")
                         st.info("De gemeente Den Haag neemt binnen 1 week contact met u op voor een vrijblijvend gesprek.")
@@ -846,33 +913,7 @@ def main():
             </div>
             """, unsafe_allow_html=True)
             
-            total_programs = len(programs)
-            matched_count = len(filter_programs(programs, user))
-            match_percentage = int((matched_count / total_programs) * 100) if total_programs > 0 else 0
-            
-            col_met1, col_met2 = st.columns(2)
-            with col_met1:
-                st.markdown(f"""
-                <div style="background: #f8f9fa; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #dee2e6;">
-                    <div style="font-size: 1.5rem; font-weight: bold; color: #154c79;">{total_programs}</div>
-                    <div style="color: #666; font-size: 0.85rem;">Beschikbare programma's</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col_met2:
-                st.markdown(f"""
-                <div style="background: #e8f5e8; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #c3e6cb;">
-                    <div style="font-size: 1.5rem; font-weight: bold; color: #155724;">{matched_count}</div>
-                    <div style="color: #155724; font-size: 0.85rem;">Voor u geschikt</div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            st.markdown(f"""
-            <div style="background: #fff3cd; padding: 1rem; border-radius: 8px; text-align: center; border: 2px solid #ffeaa7; margin-top: 0.5rem;">
-                <div style="font-size: 1.5rem; font-weight: bold; color: #856404;">{match_percentage}%</div>
-                <div style="color: #856404; font-size: 0.85rem;">Match percentage</div>
-            </div>
-            """, unsafe_allow_html=True)
+            dashboard_metrics(user)
             
             st.markdown("""
             <div style="background: white; padding: 1.5rem; border-radius: 15px; border: 1px solid #6f42c1; margin: 1.5rem 0;">
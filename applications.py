@@ -0,0 +1,189 @@
+import glob
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from array import array
+
+class ApplicationLog:
+    """Append-only JSONL log of subsidy applications and shown interest
+
+    ``submit`` only puts the record on a queue. A writer thread drains the
+    queue in batches and commits each batch with a single write and fsync,
+    so callers never wait on the disk. When the active file grows past
+    ``max_bytes`` it is renamed to ``<path>.<n>`` and a new file is started.
+    The position of every record is kept in an offset index, so reads seek
+    straight to the record instead of scanning the files.
+
+    The index lives in memory and is only built when the log is opened, so
+    a log belongs to a single process: processes must not share a path.
+
+    A batch that cannot be written is cut off the file again and retried
+    every ``retry_delay`` seconds, in order, until it is written; the
+    failure is reported once and ``flush`` returns False meanwhile.
+    """
+
+    def __init__(self, path="applications.jsonl", max_bytes=64 * 1024 * 1024, batch_size=4096, retry_delay=5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self._error = None
+        self._rotation_error = None
+        self._queue = queue.SimpleQueue()
+        self._committed = threading.Condition()
+        self._submitted = 0
+        self._written = 0
+
+        # Offset index: segment number, byte offset and length per record.
+        # Segment 0 is the active file; rotated files keep their number.
+        self._segments = array("I")
+        self._offsets = array("Q")
+        self._lengths = array("I")
+        self._rotations = 0
+        self._load_index()
+
+        self._file = open(self.path, "ab")
+        self._thread = threading.Thread(target=self._write_loop, name="application-log", daemon=True)
+        self._thread.start()
+
+    def _segment_path(self, segment):
+        return self.path if segment == 0 else f"{self.path}.{segment}"
+
+    def _load_index(self):
+        rotated = sorted(int(name.rsplit(".", 1)[1]) for name in glob.glob(f"{glob.escape(self.path)}.*")
+                         if name.rsplit(".", 1)[1].isdigit())
+        self._rotations = rotated[-1] if rotated else 0
+        for segment in rotated + [0]:
+            try:
+                with open(self._segment_path(segment), "rb") as f:
+                    offset = 0
+                    for line in f:
+                        self._add_to_index(segment, offset, len(line))
+                        offset += len(line)
+            except FileNotFoundError:
+                pass
+        self._written = len(self._offsets)
+        self._submitted = self._written
+
+    def _add_to_index(self, segment, offset, length):
+        self._segments.append(segment)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+
+    def submit(self, kind, kvk, program):
+        """Queue a record for writing and return its sequence number"""
+        record = {"type": kind, "kvk": kvk, "program": program, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._committed:
+            self._submitted += 1
+            sequence = self._submitted
+        self._queue.put(line)
+        return sequence
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            while not self._try_commit(batch):
+                time.sleep(self.retry_delay)
+
+    def _try_commit(self, batch):
+        """Commit a batch, or report why it could not be and return False"""
+        try:
+            self._commit(batch)
+        except Exception as exc:
+            with self._committed:
+                if self._error is None:
+                    print(f"Could not write to {self.path}, retrying: {exc!r}", file=sys.stderr)
+                self._error = exc
+                self._committed.notify_all()
+            return False
+        return True
+
+    def _commit(self, lines):
+        if self._file.closed:
+            self._file = open(self.path, "ab")
+        offset = self._file.tell()
+        try:
+            self._file.write(b"".join(lines))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except BaseException:
+            # Cut off whatever part of the batch reached the file, so the
+            # offset index stays right when the batch is written again
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            os.truncate(self.path, offset)
+            raise
+
+        with self._committed:
+            for line in lines:
+                self._add_to_index(0, offset, len(line))
+                offset += len(line)
+            self._written += len(lines)
+            self._error = None
+            if offset >= self.max_bytes:
+                self._try_rotate()
+            self._committed.notify_all()
+
+    def _try_rotate(self):
+        """Rotate the active file; on failure keep appending to it and try again after the next batch"""
+        try:
+            self._rotate()
+            self._rotation_error = None
+        except OSError as exc:
+            if self._rotation_error is None:
+                print(f"Could not rotate {self.path}: {exc!r}", file=sys.stderr)
+            self._rotation_error = exc
+
+    def _rotate(self):
+        os.replace(self.path, self._segment_path(self._rotations + 1))
+        self._rotations += 1
+        for i in range(len(self._segments) - 1, -1, -1):
+            if self._segments[i] != 0:
+                break
+            self._segments[i] = self._rotations
+        self._file.close()
+        self._file = open(self.path, "ab")
+
+    def flush(self, timeout=None):
+        """Wait until every record submitted so far is on disk; False when writing fails or the wait timed out"""
+        with self._committed:
+            target = self._submitted
+            self._committed.wait_for(lambda: self._written >= target or self._error is not None, timeout)
+            return self._written >= target
+
+    def __len__(self):
+        with self._committed:
+            return self._written
+
+    def read(self, start=0, count=None):
+        """Committed records start .. start + count, looked up through the offset index"""
+        handles = {}
+        try:
+            # Files are opened under the lock so a concurrent rotation cannot
+            # swap the active file between the index lookup and the open.
+            with self._committed:
+                stop = self._written if count is None else min(self._written, start + count)
+                positions = [(self._segments[i], self._offsets[i], self._lengths[i]) for i in range(start, stop)]
+                for segment in {segment for segment, _, _ in positions}:
+                    handles[segment] = open(self._segment_path(segment), "rb")
+
+            records = []
+            for segment, offset, length in positions:
+                f = handles[segment]
+                f.seek(offset)
+                records.append(json.loads(f.read(length)))
+            return records
+        finally:
+            for f in handles.values():
+                f.close()
@@ -0,0 +1,189 @@
+import re
+from bisect import bisect_left
+from itertools import chain
+
+import numpy as np
+
+from search import fold
+
+KEY_PATTERN = re.compile(r"[a-z0-9+&]+")
+
+def normalize_name(name):
+    """Folded name with punctuation other than + and & turned into single spaces"""
+    return ' '.join(KEY_PATTERN.findall(fold(name)))
+
+def max_distance_for(prefix):
+    """Typos allowed for a prefix: none for the first two letters, then one, two from eight on"""
+    if len(prefix) <= 2:
+        return 0
+    return 1 if len(prefix) < 8 else 2
+
+# Nodes whose best entries are remembered between lookups
+MAX_CACHED_NODES = 1 << 16
+
+class Autocomplete:
+    """Prefix index over program names with bounded edit-distance lookups
+
+    Each short_name and long_name is a key whole, and long names also from
+    every later word, so "ontwikkel" finds "Wet Bevordering Speur- en
+    Ontwikkelingswerk". The keys are kept in one sorted list, which is a
+    trie without the nodes: the keys below a node are the range of keys
+    starting with its path, and its children are found by bisection. The
+    best ``per_node`` entries below a node (shortest name, then catalogue
+    order) are picked from the range with numpy when a lookup reaches it,
+    so a lookup never looks below the node a prefix ends on.
+
+    Building is collecting and sorting the keys; no node is created up
+    front, so long distinct names cost no more than short shared ones.
+    """
+
+    def __init__(self, programs, per_node=16, max_visits=20000):
+        self.per_node = per_node
+        self.max_visits = max_visits
+        self.entries = []
+        # Key length and program of each entry, which rank it
+        lengths = []
+        program_ids = []
+
+        # Entries of every distinct key, including long name suffixes
+        keys = {}
+        for program_id, program in enumerate(programs):
+            for field in ('short_name', 'long_name'):
+                name = program.get(field) or ''
+                key = normalize_name(name)
+                if not key:
+                    continue
+                entry = len(self.entries)
+                self.entries.append((program_id, field, name))
+                lengths.append(len(key))
+                program_ids.append(program_id)
+                keys.setdefault(key, []).append(entry)
+                if field == 'long_name':
+                    space = key.find(' ')
+                    while space != -1:
+                        keys.setdefault(key[space + 1:], []).append(entry)
+                        space = key.find(' ', space + 1)
+
+        self.keys = sorted(keys)
+        lists = [keys[key] for key in self.keys]
+        # Entries of keys[i] are at starts[i]:starts[i + 1] of the flattened lists
+        self.starts = np.zeros(len(lists) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, lists), dtype=np.int64, count=len(lists)), out=self.starts[1:])
+        flat = np.fromiter(chain.from_iterable(lists), dtype=np.int64, count=int(self.starts[-1]))
+
+        # Entries in rank order, and the rank of each entry of each key
+        self.by_rank = np.lexsort((np.array(program_ids, dtype=np.int64), np.array(lengths, dtype=np.int64)))
+        rank = np.empty(len(self.by_rank), dtype=np.int64)
+        rank[self.by_rank] = np.arange(len(self.by_rank))
+        self.ranks = rank.tolist()
+        self.key_ranks = rank[flat]
+        # Best entries of the nodes lookups reached, by their range of keys
+        self._tops = {}
+
+    def _top(self, low, high):
+        """Best entries of the keys in keys[low:high], best first"""
+        top = self._tops.get((low, high))
+        if top is not None:
+            return top
+        ranks = self.key_ranks[self.starts[low]:self.starts[high]]
+        if len(ranks) <= 4 * self.per_node:
+            best = sorted(set(ranks.tolist()))[:self.per_node]
+        else:
+            count = self.per_node
+            while True:
+                # An entry appears once per key it is under, so take more until enough differ
+                best = np.unique(np.partition(ranks, count - 1)[:count] if count < len(ranks) else ranks)
+                if len(best) >= self.per_node or count >= len(ranks):
+                    break
+                count *= 2
+            best = best[:self.per_node]
+        top = self.by_rank[best].tolist()
+        if len(self._tops) >= MAX_CACHED_NODES:
+            self._tops.clear()
+        self._tops[low, high] = top
+        return top
+
+    def _children(self, depth, low, high):
+        """(char, low, high) of the nodes below the one at depth over keys[low:high]"""
+        keys = self.keys
+        # A key ending at this node sorts before the keys going on from it
+        if low < high and len(keys[low]) == depth:
+            low += 1
+        while low < high:
+            key = keys[low]
+            end = bisect_left(keys, key[:depth] + chr(ord(key[depth]) + 1), low, high)
+            yield key[depth], low, end
+            low = end
+
+    def lookup(self, prefix, limit=8, max_distance=None):
+        """Best completions of a typed prefix, as (program id, field, name, distance)
+
+        Exact prefix matches come first, then those one edit away and so on.
+        Edits are insertions, deletions, substitutions and swaps of two
+        neighbouring characters. Each program is returned at most once.
+        """
+        prefix = normalize_name(prefix)
+        if max_distance is None:
+            max_distance = max_distance_for(prefix)
+
+        matches = self._exact(prefix) if max_distance == 0 else self._fuzzy(prefix, max_distance)
+        matches.sort()
+
+        results = []
+        seen = set()
+        for distance, _, entry in matches:
+            program_id, field, name = self.entries[entry]
+            if program_id in seen:
+                continue
+            seen.add(program_id)
+            results.append((program_id, field, name, distance))
+            if len(results) == limit:
+                break
+        return results
+
+    def _exact(self, prefix):
+        low = bisect_left(self.keys, prefix)
+        high = bisect_left(self.keys, prefix + '\U0010ffff', low)
+        if low == high:
+            return []
+        return [(0, self.ranks[entry], entry) for entry in self._top(low, high)]
+
+    def _fuzzy(self, prefix, max_distance):
+        """Walk the implicit trie with one row of the edit-distance table per node
+
+        A node matches when the path to it is within max_distance of the whole
+        prefix; its best entries cover everything below it, so below a match
+        the walk only continues while a closer match is still possible.
+        Branches whose best cell exceeds max_distance are pruned.
+        """
+        matches = []
+        best = {}
+        first_row = list(range(len(prefix) + 1))
+        # (node, char leading to it, row of its parent, row before that, parent char),
+        # a node being its depth and the range of keys below it
+        stack = [((1, low, high), char, first_row, None, '')
+                 for char, low, high in self._children(0, 0, len(self.keys))]
+        visits = 0
+        while stack and visits < self.max_visits:
+            node, char, previous, before, previous_char = stack.pop()
+            depth, low, high = node
+            visits += 1
+
+            row = [previous[0] + 1]
+            for i in range(1, len(prefix) + 1):
+                cost = 0 if prefix[i - 1] == char else 1
+                value = min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + cost)
+                if (before is not None and i > 1 and prefix[i - 1] == previous_char
+                        and prefix[i - 2] == char):
+                    value = min(value, before[i - 2] + 1)
+                row.append(value)
+
+            distance = row[-1]
+            if distance <= max_distance and best.get(node, max_distance + 1) > distance:
+                best[node] = distance
+                matches.extend((distance, self.ranks[entry], entry) for entry in self._top(low, high))
+            # Below a matching node only a closer match is worth looking for
+            if min(row) < min(distance, max_distance + 1):
+                stack.extend(((depth + 1, child_low, child_high), next_char, row, previous, char)
+                             for next_char, child_low, child_high in self._children(depth, low, high))
+        return matches
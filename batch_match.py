@@ -0,0 +1,170 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from catalogue import CatalogueStore
+from matching import build_program_index, clean_profile, filter_program_ids, score_profiles
+
+# Loaded in the parent before the pool starts, so forked workers share the
+# catalogue and its index copy-on-write instead of each building their own.
+_catalogue = None
+
+def _load_catalogue(path):
+    global _catalogue
+    if _catalogue is None:
+        _catalogue = CatalogueStore(path, prepare=build_program_index, check_interval=float("inf")).current()
+    return _catalogue
+
+def read_profiles(path):
+    """(line number, profile) of every company in a CSV or JSONL file; None for a line that is not JSON
+
+    CSV values stay strings; match_chunk coerces the numeric ones.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError:
+                        yield number, None
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def match_chunk(entries, filters, limit, min_score):
+    """JSON lines with the ranked matches of the profiles in a chunk, and (line number, reason) of those skipped
+
+    A profile with an invalid field is skipped. When scoring the chunk
+    fails, its profiles are scored one at a time so only the failing ones
+    are skipped.
+    """
+    numbers, profiles, skipped = [], [], []
+    for number, profile in entries:
+        try:
+            if not isinstance(profile, dict):
+                raise ValueError("not a JSON object")
+            profiles.append(clean_profile(profile))
+            numbers.append(number)
+        except ValueError as exc:
+            skipped.append((number, str(exc)))
+
+    candidates = np.array(filter_program_ids(_catalogue.index, filters), dtype=np.int64)
+    try:
+        lines = _match_profiles(profiles, candidates, limit, min_score)
+    except Exception:
+        lines = []
+        for number, profile in zip(numbers, profiles):
+            try:
+                lines.extend(_match_profiles([profile], candidates, limit, min_score))
+            except Exception as exc:
+                skipped.append((number, f"{type(exc).__name__}: {exc}"))
+    return lines, sorted(skipped)
+
+def _match_profiles(profiles, candidates, limit, min_score):
+    catalogue = _catalogue
+    index = catalogue.index
+    scores = score_profiles(index, profiles, candidates)
+
+    lines = []
+    for j, profile in enumerate(profiles):
+        column = scores[:, j]
+        keep = np.flatnonzero(column >= min_score)
+        eligible = index["eligibility"].mask(profile)
+        if eligible is not None:
+            keep = keep[eligible[candidates[keep]]]
+        # Best score first, ties in catalogue order, as in the app
+        order = keep[np.lexsort((candidates[keep], -column[keep]))]
+        if limit:
+            order = order[:limit]
+        matches = [
+            {"short_name": catalogue.programs[int(candidates[i])].get("short_name"), "score": int(column[i])}
+            for i in order
+        ]
+        lines.append(json.dumps({"kvk": profile.get("kvk"), "bsn": profile.get("bsn"), "matches": matches}, ensure_ascii=False))
+    return lines
+
+def run(profiles_path, output, catalogue_path="data.json", filters=None, limit=10, min_score=0,
+        workers=None, chunk_size=500, progress_every=10000, log=sys.stderr):
+    """Score every profile in profiles_path and write one JSON line per company"""
+    _load_catalogue(catalogue_path)
+    workers = workers or multiprocessing.cpu_count()
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+
+    done = 0
+    skipped = 0
+    reported = 0
+    started = time.perf_counter()
+
+    with context.Pool(workers, initializer=_load_catalogue, initargs=(catalogue_path,)) as pool:
+        # At most two chunks per worker are in flight, which bounds memory no
+        # matter how large the input is, and results are written in input order.
+        pending = deque()
+        for chunk in chunked(read_profiles(profiles_path), chunk_size):
+            pending.append((len(chunk), pool.apply_async(match_chunk, (chunk, filters, limit, min_score))))
+            while len(pending) >= 2 * workers:
+                count, failed = _write_result(pending.popleft(), output, log)
+                done += count
+                skipped += failed
+            if progress_every and done - reported >= progress_every:
+                reported = done
+                print(f"{done} companies, {done / (time.perf_counter() - started):.0f} companies/s", file=log)
+        while pending:
+            count, failed = _write_result(pending.popleft(), output, log)
+            done += count
+            skipped += failed
+
+    elapsed = time.perf_counter() - started
+    return {"companies": done, "skipped": skipped, "seconds": elapsed,
+            "companies_per_second": done / elapsed if elapsed else 0.0}
+
+def _write_result(entry, output, log):
+    """Write a finished chunk and report its skipped profiles; (profiles read, profiles skipped)"""
+    count, result = entry
+    lines, skipped = result.get()
+    for line in lines:
+        output.write(line + "\n")
+    for number, reason in skipped:
+        print(f"line {number} skipped: {reason}", file=log)
+    return count, len(skipped)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Match a register of company profiles against the program catalogue")
+    parser.add_argument("profiles", help="CSV or JSONL file of company profiles")
+    parser.add_argument("output", nargs="?", help="JSONL output file (default: stdout)")
+    parser.add_argument("--catalogue", default="data.json")
+    parser.add_argument("--filters", type=json.loads, default=None, help="filters as a JSON object, as used by filter_programs")
+    parser.add_argument("--limit", type=int, default=10, help="matches per company, 0 for all")
+    parser.add_argument("--min-score", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    args = parser.parse_args()
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        stats = run(args.profiles, output, args.catalogue, args.filters, args.limit, args.min_score,
+                    args.workers, args.chunk_size)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{stats['companies'] - stats['skipped']} companies matched in {stats['seconds']:.1f}s, "
+          f"{stats['companies_per_second']:.0f} companies/s, {stats['skipped']} skipped", file=sys.stderr)
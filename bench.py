@@ -0,0 +1,269 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from catalogue import CatalogueStore, convert_json
+from matching import build_program_index, calculate_match_score, filter_programs, score_programs
+
+# The filter values main() can produce, per filter. household_size and
+# age_range never narrow the catalogue, so they are left at their default.
+# The filter triggers in rules.json are Dutch, so of these only
+# expense_type='training' narrows anything; the other cases time the path
+# where no filter applies.
+FILTER_OPTIONS = {
+    'income_level': [None, 'low', 'medium', 'high'],
+    'filing_status': [None, 'individual', 'business', 'non-profit'],
+    'employment_status': [None, 'employed', 'unemployed', 'self-employed', 'student'],
+    'expense_type': [None, 'business', 'personal', 'equipment', 'training', 'research'],
+}
+
+# Selectbox labels that do hit a trigger, one case per filter group
+TRIGGER_OPTIONS = {
+    'income_level': [None, 'Laag inkomen (< €30.000)', 'Midden inkomen (€30.000 - €70.000)', 'Hoog inkomen (> €70.000)'],
+    'filing_status': [None, 'Particulier', 'Bedrijf/Onderneming'],
+    'employment_status': [None, 'Zelfstandig ondernemer'],
+    'expense_type': [None, 'Bedrijfskosten', 'Apparatuur/Equipment', 'Training/Opleiding', 'Onderzoek & Ontwikkeling'],
+}
+
+BUSINESS_TYPES = ['SME', 'Large', 'Startup', 'ZZP']
+SECTORS = ['Technology', 'Government & Leadership', 'Retail', 'Manufacturing', 'Healthcare', 'Agriculture', 'Logistics']
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+
+SEARCH_QUERIES = ['innovatie', 'subsidies voor bedrijven', 'energie besparing']
+
+def filter_combinations(options=FILTER_OPTIONS):
+    """Every filters dict built from the options, by default those main() can build"""
+    for values in itertools.product(*options.values()):
+        filters = dict(zip(options, values))
+        filters.update(household_size=None, age_range=None)
+        yield filters
+
+def generate_programs(count, templates, seed=0):
+    """data.json-shaped programs, recombined from the fields of the template programs"""
+    rnd = random.Random(seed)
+    sentences = [s.strip() for t in templates for s in t.get('description', '').split('.') if s.strip()]
+    criteria = [c for t in templates for c in t.get('criteria', [])]
+    benefits = [b for t in templates for b in t.get('benefits', [])]
+    for i in range(count):
+        template = templates[i % len(templates)]
+        yield {
+            'short_name': f"{template.get('short_name', 'Programma')} {i}",
+            'long_name': template.get('long_name', ''),
+            'description': '. '.join(rnd.sample(sentences, min(2, len(sentences)))) + '.',
+            'criteria': rnd.sample(criteria, min(rnd.randint(1, 6), len(criteria))),
+            'benefits': rnd.sample(benefits, min(rnd.randint(1, 5), len(benefits))),
+        }
+
+def generate_profiles(count, seed=0):
+    """Random company profiles with the fields the matching code reads"""
+    rnd = random.Random(seed)
+    for i in range(count):
+        yield {
+            'bsn': f"{100000000 + i}",
+            'kvk': f"{10000000 + i}",
+            'business_type': rnd.choice(BUSINESS_TYPES),
+            'sector': rnd.choice(SECTORS),
+            'employees': rnd.choice([1, 5, 12, 30, 50, 120, 800]),
+            'annual_revenue': rnd.choice([40000, 250000, 500000, 2000000, 25000000]),
+        }
+
+def write_catalogue(path, programs):
+    """Write programs as a JSON array one record at a time"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[\n')
+        for i, program in enumerate(programs):
+            if i:
+                f.write(',\n')
+            json.dump(program, f, ensure_ascii=False)
+        f.write('\n]\n')
+
+def summarize(samples, peak_bytes):
+    """Latency percentiles in milliseconds and the traced memory peak of one case"""
+    ms = np.array(samples) * 1000
+    return {
+        'runs': len(samples),
+        'mean_ms': round(float(ms.mean()), 4),
+        'min_ms': round(float(ms.min()), 4),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p90_ms': round(float(np.percentile(ms, 90)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'max_ms': round(float(ms.max()), 4),
+        'peak_kib': round(peak_bytes / 1024, 1),
+    }
+
+def measure(fn, repeat):
+    """Time fn repeat times, then run it once more under tracemalloc for the memory peak
+
+    The traced run is kept out of the timings, tracing slows allocation down.
+    """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summarize(samples, peak)
+
+def bench_size(size, templates, workdir, repeat, seed, log):
+    """All cases for one catalogue size"""
+    json_path = os.path.join(workdir, f"programs-{size}.json")
+    bin_path = os.path.join(workdir, f"programs-{size}.bin")
+    write_catalogue(json_path, generate_programs(size, templates, seed))
+    convert_json(json_path, bin_path)
+    profiles = list(generate_profiles(max(repeat, 100), seed))
+    results = {}
+
+    def case(name, fn, runs=repeat):
+        print(f"  {name}", file=log)
+        results[f"{name}[n={size}]"] = measure(fn, runs)
+
+    # Loading is slow at the larger sizes, keep it to a few runs
+    load_runs = max(3, repeat // 10)
+    case('load_programs[json]', lambda: CatalogueStore(json_path, prepare=build_program_index).current(), load_runs)
+    case('load_programs[bin]', lambda: CatalogueStore(bin_path, prepare=build_program_index).current(), load_runs)
+
+    catalogue = CatalogueStore(json_path, prepare=build_program_index).current()
+    programs, index = catalogue.programs, catalogue.index
+    for label, filter_options in (('', FILTER_OPTIONS), ('trigger ', TRIGGER_OPTIONS)):
+        combinations = list(filter_combinations(filter_options))
+
+        def all_filter_combinations(combinations=combinations):
+            for filters in combinations:
+                filter_programs(programs, profiles[0], filters, index)
+        case(f'filter_programs[all {label}combinations]', all_filter_combinations, max(1, repeat // 10))
+
+        for key, options in filter_options.items():
+            for value in options[1:]:
+                filters = dict.fromkeys(filter_options, None)
+                filters[key] = value
+                case(f'filter_programs[{key}={value}]', lambda filters=filters: filter_programs(programs, profiles[0], filters, index))
+
+    sample = programs[:min(size, 1000)]
+    profile_cycle = itertools.cycle(profiles)
+    case(f'calculate_match_score[x{len(sample)}]',
+         lambda: [calculate_match_score(program, next(profile_cycle)) for program in sample])
+    case('score_programs', lambda: score_programs(index, next(profile_cycle)))
+
+    search = index['search']
+    for query in SEARCH_QUERIES:
+        case(f'search[{query}]', lambda query=query: search.search(query))
+
+    semantic = index['semantic']
+    if semantic is not None:
+        for query in SEARCH_QUERIES:
+            case(f'semantic_search[{query}]', lambda query=query: semantic.search(semantic.embed(query), 10))
+
+    # One result page: rank the catalogue and build the HTML of its cards,
+    # with an empty card cache (first view) and a warm one (pagination back).
+    # app is only imported here because it pulls in Streamlit.
+    import app
+    scores = score_programs(index, profiles[0])
+    page_size = 3
+
+    def render_page():
+        cursor = {'key': None, 'ranked': [], 'scores': scores}
+        ids = list(range(size))
+        return [app.render_program_card(catalogue.version, i, programs[i], int(scores[i]))
+                for i in app.ranked_page(cursor, ids, 0, page_size)]
+
+    def render_page_cold():
+        app.get_card_cache().entries.clear()
+        render_page()
+    case('render_page[cold]', render_page_cold)
+    case('render_page[warm]', render_page)
+
+    return results
+
+def run(sizes, repeat=50, seed=0, catalogue_path="data.json", log=sys.stderr):
+    """Run the benchmark suite and return the report as a dict"""
+    with open(catalogue_path, 'r', encoding='utf-8') as f:
+        templates = json.load(f)
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sizes': sizes,
+            'repeat': repeat,
+            'seed': seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='bench-') as workdir:
+        for size in sizes:
+            print(f"{size} programs", file=log)
+            report['results'].update(bench_size(size, templates, workdir, repeat, seed, log))
+    return report
+
+def compare(baseline, current, threshold=0.2, metric='p50_ms', min_delta_ms=0.05):
+    """Cases whose metric got more than threshold slower than in the baseline
+
+    Returns a list of (case, baseline, current, ratio) for every case present
+    in both reports, and the subset of those that regressed. Slowdowns below
+    min_delta_ms are timer jitter on the sub-microsecond cases and never count.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        ratio = result[metric] / before[metric] if before[metric] else float('inf')
+        rows.append((name, before[metric], result[metric], ratio))
+    regressions = [row for row in rows if row[3] > 1 + threshold and row[2] - row[1] >= min_delta_ms]
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the matching hot paths on synthetic catalogues")
+    parser.add_argument("--sizes", default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated catalogue sizes, e.g. 100,1000,1000000")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--catalogue", default="data.json", help="programs the synthetic catalogues are built from")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare against an earlier report, exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown for --compare (0.2 = 20%%)")
+    parser.add_argument("--metric", default="p50_ms", help="report field compared by --compare")
+    parser.add_argument("--min-delta-ms", type=float, default=0.05, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    report = run([int(size) for size in args.sizes.split(',')], args.repeat, args.seed, args.catalogue)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(baseline, report, args.threshold, args.metric, args.min_delta_ms)
+        for row in rows:
+            name, before, after, ratio = row
+            flag = '  REGRESSION' if row in regressions else ''
+            print(f"{name:60} {before:10.3f} -> {after:10.3f} {args.metric} ({ratio:5.2f}x){flag}", file=sys.stderr)
+        if regressions:
+            print(f"{len(regressions)} of {len(rows)} cases more than {args.threshold:.0%} slower", file=sys.stderr)
+            sys.exit(1)
+        print(f"No regressions in {len(rows)} cases", file=sys.stderr)
@@ -0,0 +1,270 @@
+import argparse
+import json
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import traceback
+from collections import namedtuple
+from collections.abc import Sequence
+
+Catalogue = namedtuple("Catalogue", ["version", "programs", "index", "stamp"])
+
+# Binary catalogue layout (little-endian):
+#   header   magic, record count, offset of the record offset table
+#   records  per program: criteria count, benefits count, then the strings
+#            short_name, long_name, description, criteria..., benefits...
+#            and a JSON object holding any other fields ("" when none),
+#            each stored as a byte length followed by UTF-8 bytes
+#   offsets  one uint64 file offset per record
+MAGIC = b"HWCAT001"
+HEADER = struct.Struct("<8sQQ")
+COUNTS = struct.Struct("<HH")
+LENGTH = struct.Struct("<I")
+OFFSET = struct.Struct("<Q")
+
+PROGRAM_FIELDS = ("short_name", "long_name", "description", "criteria", "benefits")
+
+def encode_program(program):
+    """Binary record for one program dict"""
+    criteria = program["criteria"]
+    benefits = program["benefits"]
+    extra = {key: value for key, value in program.items() if key not in PROGRAM_FIELDS}
+    strings = [
+        program["short_name"],
+        program["long_name"],
+        program["description"],
+        *criteria,
+        *benefits,
+        json.dumps(extra, ensure_ascii=False, separators=(",", ":")) if extra else "",
+    ]
+
+    parts = [COUNTS.pack(len(criteria), len(benefits))]
+    for string in strings:
+        data = string.encode("utf-8")
+        parts.append(LENGTH.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+class CatalogueWriter:
+    """Writes a binary catalogue one program at a time
+
+    Records go straight to disk and their offsets are spooled to a temporary
+    file, so memory use does not grow with the catalogue. The result replaces
+    ``path`` atomically on close.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(HEADER.pack(MAGIC, 0, 0))
+        self._offsets = tempfile.TemporaryFile()
+
+    def add(self, program):
+        record = encode_program(program)
+        self._offsets.write(OFFSET.pack(self._file.tell()))
+        self._file.write(record)
+        self.count += 1
+
+    def close(self):
+        offsets_at = self._file.tell()
+        self._offsets.seek(0)
+        shutil.copyfileobj(self._offsets, self._file)
+        self._offsets.close()
+
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, self.count, offsets_at))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._offsets.close()
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class BinaryCatalogue(Sequence):
+    """Read-only, memory-mapped view of a binary catalogue
+
+    Programs are decoded from the mapping only when accessed, and the pages
+    are shared through the OS page cache by every process mapping the file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        magic, self._count, self._offsets_at = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a binary program catalogue")
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("catalogue index out of range")
+
+        (offset,) = OFFSET.unpack_from(self._map, self._offsets_at + i * OFFSET.size)
+        return self._decode(offset)
+
+    def _decode(self, offset):
+        n_criteria, n_benefits = COUNTS.unpack_from(self._map, offset)
+        offset += COUNTS.size
+
+        strings = []
+        for _ in range(4 + n_criteria + n_benefits):
+            (length,) = LENGTH.unpack_from(self._map, offset)
+            offset += LENGTH.size
+            strings.append(str(self._view[offset:offset + length], "utf-8"))
+            offset += length
+
+        benefits_end = 3 + n_criteria + n_benefits
+        program = {
+            "short_name": strings[0],
+            "long_name": strings[1],
+            "description": strings[2],
+            "criteria": strings[3:3 + n_criteria],
+            "benefits": strings[3 + n_criteria:benefits_end],
+        }
+        if strings[benefits_end]:
+            program.update(json.loads(strings[benefits_end]))
+        return program
+
+def convert_json(json_path, binary_path):
+    """Convert a data.json-style program list to a binary catalogue"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        programs = json.load(f)
+    with CatalogueWriter(binary_path) as writer:
+        for program in programs:
+            writer.add(program)
+    return writer.count
+
+def refresh_binary(json_path, binary_path):
+    """Convert the JSON catalogue to the binary format when the binary is missing or older"""
+    if not os.path.exists(binary_path) or os.path.getmtime(binary_path) < os.path.getmtime(json_path):
+        convert_json(json_path, binary_path)
+
+class CatalogueStore:
+    """Program catalogue that follows data.json on disk
+
+    The file is checked by inode, mtime and size at most once per
+    ``check_interval`` seconds. A changed file is parsed on a background
+    thread and swapped in as a whole, so readers keep getting the previous
+    version until the new one is ready and never wait for a reparse.
+
+    With ``binary_path`` the store still follows the JSON file, but every
+    version is converted to that binary catalogue and memory-mapped from
+    it, so processes sharing the binary share one copy in the page cache.
+    """
+
+    def __init__(self, path="data.json", prepare=None, check_interval=1.0, binary_path=None):
+        self.path = path
+        self.binary_path = binary_path
+        self.prepare = prepare
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reloading = False
+        self._failed_stamp = None
+        self._checked_at = time.monotonic()
+        self._listeners = []
+        self._current = self._load(self._stat())
+
+    def subscribe(self, listener):
+        """Call ``listener(catalogue)`` from the reload thread after each swap"""
+        self._listeners.append(listener)
+
+    def _stat(self):
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self, stamp):
+        if self.binary_path:
+            refresh_binary(self.path, self.binary_path)
+            programs = BinaryCatalogue(self.binary_path)
+        elif self.path.endswith(".bin"):
+            programs = BinaryCatalogue(self.path)
+        else:
+            with open(self.path, "r", encoding="utf-8") as f:
+                programs = json.load(f)
+        index = self.prepare(programs) if self.prepare else None
+        version = "{:x}-{:x}-{:x}".format(*stamp)
+        return Catalogue(version, programs, index, stamp)
+
+    def current(self):
+        """The most recently loaded catalogue"""
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._check()
+        return self._current
+
+    def _check(self):
+        try:
+            stamp = self._stat()
+        except OSError:
+            return
+        if stamp == self._current.stamp or stamp == self._failed_stamp:
+            return
+
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, args=(stamp,), daemon=True).start()
+
+    def _reload(self, stamp):
+        try:
+            catalogue = self._load(stamp)
+        except Exception:
+            # Half-written or invalid file: keep serving the current version.
+            # The stamp is remembered, so the file is parsed again only once
+            # it changes, and the error is reported once per version.
+            self._failed_stamp = stamp
+            print(f"{self.path} could not be loaded, keeping version {self._current.version}", file=sys.stderr)
+            traceback.print_exc(file=sys.stderr)
+            return
+        finally:
+            with self._lock:
+                self._reloading = False
+
+        self._current = catalogue
+        for listener in self._listeners:
+            listener(self._current)
+
+    def reload(self):
+        """Load the file now, in the calling thread"""
+        self._current = self._load(self._stat())
+        for listener in self._listeners:
+            listener(self._current)
+        return self._current
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSON program catalogue to the binary format")
+    parser.add_argument("source", nargs="?", default="data.json")
+    parser.add_argument("target", nargs="?", default="data.bin")
+    args = parser.parse_args()
+
+    count = convert_json(args.source, args.target)
+    print(f"{count} programs written to {args.target}")
@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+import threading
+import time
+
+class CompanyStore:
+    """Company profiles stored as one compact JSON file per KvK number
+
+    ``save`` hands the record to a write-behind thread and returns at once.
+    Saves of the same KvK number that arrive within ``delay`` seconds of
+    each other are coalesced into a single write. Every write goes to a
+    temporary file that is fsynced and renamed over the record, so readers
+    and other processes only ever see complete records.
+
+    A record whose write fails stays pending and is retried every
+    ``retry_delay`` seconds; the failure is reported once per save.
+    """
+
+    def __init__(self, directory="companies", delay=0.2, retry_delay=5.0):
+        self.directory = directory
+        self.delay = delay
+        self.retry_delay = retry_delay
+        self._pending = {}
+        self._writing = {}
+        self._errors = {}
+        self._cond = threading.Condition()
+        os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="company-store", daemon=True)
+        self._thread.start()
+
+    def _path(self, kvk):
+        kvk = str(kvk)
+        if not kvk.isalnum():
+            raise ValueError(f"invalid KvK number: {kvk!r}")
+        return os.path.join(self.directory, f"{kvk}.json")
+
+    def save(self, company):
+        """Queue a company record for writing, keyed by its KvK number"""
+        path = self._path(company["kvk"])
+        with self._cond:
+            self._pending[path] = dict(company)
+            self._errors.pop(path, None)
+            self._cond.notify_all()
+
+    def load(self, kvk):
+        """Latest saved record for a KvK number, or None"""
+        path = self._path(kvk)
+        with self._cond:
+            record = self._pending.get(path) or self._writing.get(path)
+            if record is not None:
+                return dict(record)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+
+            # Give rapid re-saves of the same record a moment to coalesce
+            time.sleep(self.delay)
+
+            with self._cond:
+                self._writing, self._pending = self._pending, {}
+
+            failed = {}
+            for path, record in self._writing.items():
+                try:
+                    self._write(path, record)
+                except Exception as exc:
+                    failed[path] = (record, exc)
+
+            with self._cond:
+                for path in self._writing:
+                    if path not in failed:
+                        self._errors.pop(path, None)
+                for path, (record, exc) in failed.items():
+                    if path in self._pending:
+                        # Saved again meanwhile; the newer record is written next
+                        continue
+                    if path not in self._errors:
+                        print(f"Could not write {path}, retrying: {exc!r}", file=sys.stderr)
+                    self._errors[path] = exc
+                    self._pending[path] = record
+                self._writing = {}
+                self._cond.notify_all()
+
+            if failed:
+                time.sleep(self.retry_delay)
+
+    def _write(self, path, record):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(record, f, ensure_ascii=False, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def flush(self, timeout=None):
+        """Wait until every queued record has been written or has failed; True when all were written"""
+        with self._cond:
+            settled = self._cond.wait_for(
+                lambda: not self._writing and all(path in self._errors for path in self._pending), timeout
+            )
+            return settled and not self._pending
@@ -0,0 +1,206 @@
+import math
+
+import numpy as np
+
+from search import TOKEN_PATTERN, fold
+
+# Structured eligibility of a program, all of it optional:
+#
+#   "eligibility": {
+#       "min_employees": 10, "max_employees": 250,
+#       "min_revenue": 0, "max_revenue": 50000000,
+#       "legal_forms": ["BV", "NV"],
+#       "sectors": ["technology", "manufacturing"],
+#       "regions": ["Zuid-Holland", "Den Haag"]
+#   }
+#
+# Bounds are inclusive. A missing bound or an empty list does not constrain,
+# so records with free-text criteria only stay eligible for every profile.
+
+# (profile field, lower bound key, upper bound key)
+RANGE_FIELDS = (
+    ('employees', 'min_employees', 'max_employees'),
+    ('annual_revenue', 'min_revenue', 'max_revenue'),
+)
+
+# (list key, profile fields tried in order)
+SET_FIELDS = (
+    ('legal_forms', ('legal_form', 'legalForm')),
+    ('sectors', ('sector',)),
+    ('regions', ('region', 'location')),
+)
+
+ELIGIBILITY_KEYS = frozenset(
+    [key for _, low, high in RANGE_FIELDS for key in (low, high)] + [key for key, _ in SET_FIELDS]
+)
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+def eligibility_problem(eligibility):
+    """Reason an eligibility object does not fit the schema, or None when it does"""
+    if eligibility is None:
+        return None
+    if not isinstance(eligibility, dict):
+        return "eligibility is not an object"
+    for key in eligibility:
+        if key not in ELIGIBILITY_KEYS:
+            return f"eligibility.{key} is not a known field"
+    for _, low_key, high_key in RANGE_FIELDS:
+        low, high = eligibility.get(low_key), eligibility.get(high_key)
+        for key, value in ((low_key, low), (high_key, high)):
+            if value is not None and not is_number(value):
+                return f"eligibility.{key} is not a number"
+        if low is not None and high is not None and low > high:
+            return f"eligibility.{low_key} is above {high_key}"
+    for key, _ in SET_FIELDS:
+        values = eligibility.get(key)
+        if values is not None and (not isinstance(values, list) or not all(isinstance(value, str) for value in values)):
+            return f"eligibility.{key} is not a list of strings"
+    return None
+
+def category(value):
+    return fold(value).strip()
+
+def profile_categories(profile, fields):
+    """Lookup keys of the first set profile field: the whole value and each of its words
+
+    A program listing "technology" then admits a profile in "Technology &
+    Innovation", with every lookup still an exact dictionary hit.
+    """
+    for field in fields:
+        value = profile.get(field)
+        if value:
+            value = category(str(value))
+            return frozenset([value, *TOKEN_PATTERN.findall(value)])
+    return None
+
+def profile_number(profile, field):
+    value = profile.get(field)
+    return value if is_number(value) else None
+
+class RangeIndex:
+    """Inclusive [low, high] ranges of the programs bounding one numeric field
+
+    Lows and highs are kept sorted separately. The programs a value falls
+    outside of are those with a low above it and those with a high below it:
+    a suffix of one order and a prefix of the other, each found by binary
+    search, so a query costs two searches plus the programs it excludes.
+    """
+
+    def __init__(self, ranges):
+        ids = np.array([program_id for program_id, _, _ in ranges], dtype=np.int64)
+        lows = np.array([low for _, low, _ in ranges], dtype=np.float64)
+        highs = np.array([high for _, _, high in ranges], dtype=np.float64)
+
+        by_low = np.argsort(lows, kind='stable')
+        by_high = np.argsort(highs, kind='stable')
+        self.lows, self.low_ids = lows[by_low], ids[by_low]
+        self.highs, self.high_ids = highs[by_high], ids[by_high]
+
+    def __len__(self):
+        return len(self.lows)
+
+    def excluded(self, value):
+        """Ids of the programs whose range does not contain value"""
+        above = self.low_ids[np.searchsorted(self.lows, value, side='right'):]
+        below = self.high_ids[:np.searchsorted(self.highs, value, side='left')]
+        return np.concatenate((above, below))
+
+class SetIndex:
+    """Allowed values of the programs restricting one categorical field, as posting lists"""
+
+    def __init__(self, sets):
+        postings = {}
+        for program_id, values in sets:
+            for value in values:
+                postings.setdefault(value, []).append(program_id)
+        self.postings = {value: np.array(ids, dtype=np.int64) for value, ids in postings.items()}
+        self.restricted = np.array([program_id for program_id, _ in sets], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.restricted)
+
+    def excluded(self, keys):
+        """Ids of the restricting programs that allow none of the keys"""
+        allowed = [self.postings[key] for key in keys if key in self.postings]
+        if not allowed:
+            return self.restricted
+        return np.setdiff1d(self.restricted, np.concatenate(allowed))
+
+class EligibilityIndex:
+    """Range and posting-list index over the structured eligibility of a catalogue
+
+    Matching a profile is one range query per numeric field and a few
+    dictionary lookups per categorical field; only programs that state a
+    constraint are looked at. A profile field that is not set excludes
+    nothing, as there is nothing to check it against.
+    """
+
+    def __init__(self, eligibilities):
+        self.size = len(eligibilities)
+        ranges = {field: [] for field, _, _ in RANGE_FIELDS}
+        sets = {key: [] for key, _ in SET_FIELDS}
+        constrained = 0
+
+        for program_id, eligibility in enumerate(eligibilities):
+            if not eligibility:
+                continue
+            problem = eligibility_problem(eligibility)
+            if problem:
+                raise ValueError(f"program {program_id}: {problem}")
+            found = False
+            for field, low_key, high_key in RANGE_FIELDS:
+                low, high = eligibility.get(low_key), eligibility.get(high_key)
+                if low is not None or high is not None:
+                    ranges[field].append((
+                        program_id,
+                        -math.inf if low is None else low,
+                        math.inf if high is None else high,
+                    ))
+                    found = True
+            for key, _ in SET_FIELDS:
+                values = {category(value) for value in eligibility.get(key) or ()}
+                values.discard('')
+                if values:
+                    sets[key].append((program_id, values))
+                    found = True
+            constrained += found
+
+        self.constrained = constrained
+        self.ranges = {field: RangeIndex(entries) for field, entries in ranges.items() if entries}
+        self.sets = {key: SetIndex(entries) for key, entries in sets.items() if entries}
+        self.set_fields = [(key, fields) for key, fields in SET_FIELDS if key in self.sets]
+
+    def profile_key(self, profile):
+        """The profile values the index looks at, as a hashable tuple"""
+        if not self.constrained:
+            return ()
+        return (
+            tuple(profile_number(profile, field) for field in self.ranges),
+            tuple(profile_categories(profile, fields) for _, fields in self.set_fields),
+        )
+
+    def excluded(self, profile):
+        """Ids of the programs the profile is not eligible for, possibly repeated"""
+        parts = []
+        for field, ranges in self.ranges.items():
+            value = profile_number(profile, field)
+            if value is not None:
+                parts.append(ranges.excluded(value))
+        for key, fields in self.set_fields:
+            keys = profile_categories(profile, fields)
+            if keys is not None:
+                parts.append(self.sets[key].excluded(keys))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def mask(self, profile):
+        """Boolean array of the programs a profile is eligible for, or None when it is eligible for all"""
+        if not self.constrained or profile is None:
+            return None
+        excluded = self.excluded(profile)
+        if not len(excluded):
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        mask[excluded] = False
+        return mask
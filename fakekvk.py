@@ -1,12 +1,16 @@
 # Company Info Streamlit Web App
 import streamlit as st
-import json
-import time
 
-# Function to save company data to JSON file
-def save_company_to_file(company, filename="company_data.json"):
-    with open(filename, "w") as f:
-        json.dump(company, f, indent=2)
+from company_store import CompanyStore
+
+# Company records are stored one file per KvK number
+@st.cache_resource
+def get_company_store():
+    return CompanyStore("companies")
+
+# Function to save company data
+def save_company_to_file(company):
+    get_company_store().save(company)
 
 # Page configuration
 st.set_page_config(page_title="Company Info", page_icon="🏢", layout="centered")
@@ -123,6 +127,8 @@ st.markdown('<div class="modern-title">Company Info</div>', unsafe_allow_html=Tr
 st.markdown('<div class="modern-desc">Easily update and save your company details below.</div>', unsafe_allow_html=True)
 
 # Initialize session state
+st.session_state.script_runs = st.session_state.get("script_runs", 0) + 1
+
 if 'company' not in st.session_state:
     st.session_state.company = {
         "companyName": "Acme Corp",
@@ -148,19 +154,20 @@ with st.form("edit_company"):
     )
     save = st.form_submit_button("Save")
 
-# Handle Save with auto-dismiss after 5 seconds
+# Handle Save; the toast is dismissed by the browser, so a save costs a single script run
 if save:
     st.session_state.company = company
-    save_company_to_file(company)
-    st.session_state.saved_time = time.time()
-    st.session_state.show_saved = True
-
-if st.session_state.get("show_saved", False):
-    st.success("Saved")
-    # Check if 5 seconds have passed
-    if time.time() - st.session_state.get("saved_time", 0) > 5:
-        st.session_state.show_saved = False
-        st.experimental_rerun()
+    try:
+        save_company_to_file(company)
+    except ValueError:
+        st.error("KVK Number may only contain letters and digits")
+    else:
+        st.toast("Saved", icon="✅")
+        st.session_state.last_save_run = st.session_state.script_runs
+
+# Script executions since the last save, shown with ?debug=1
+if st.query_params.get("debug") and "last_save_run" in st.session_state:
+    st.caption(f"Script runs since last save: {st.session_state.script_runs - st.session_state.last_save_run + 1}")
 
 # Close container
 st.markdown('</div>', unsafe_allow_html=True)
@@ -0,0 +1,143 @@
+import argparse
+import itertools
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+# Handshake states, in the order a successful login passes through them
+REDIRECTING = "redirecting"
+CONNECTING = "connecting"
+AUTHENTICATED = "authenticated"
+FAILED = "failed"
+
+FINISHED_STATES = (AUTHENTICATED, FAILED)
+
+LoginStatus = namedtuple("LoginStatus", ["state", "bsn", "auth_time"])
+
+LOCAL_USERS = {
+    "123456789": {
+        "name": "King Arthur",
+        "bsn": "123456789",
+        "company": "Camelot Enterprises B.V.",
+        "kvk": "88776655",
+        "business_type": "SME",
+        "stage": "Growth",
+        "location": "Den Haag",
+        "employees": 25,
+        "annual_revenue": 1200000,
+        "sector": "Government & Leadership",
+        "email": "king.arthur@camelot.nl",
+        "phone": "+31 6 1234 5678",
+        "address": "Ridderzaal 1, 2511 CR Den Haag"
+    }
+}
+
+DEMO_BSN = "123456789"
+
+class IdentityProvider(ABC):
+    """Interface for DigiD-style identity providers
+
+    A login is a handshake: ``start`` opens it and returns its id, and
+    ``poll`` reports its current LoginStatus, which carries the user's BSN
+    once the handshake succeeds. Neither call may block on the remote side;
+    a provider that is still waiting simply reports the same unfinished
+    state again.
+    """
+
+    name = "DigiD"
+
+    @abstractmethod
+    def start(self, bsn):
+        """Open a handshake for a BSN and return its id"""
+
+    @abstractmethod
+    def poll(self, handshake_id):
+        """Current LoginStatus of a handshake"""
+
+    def cancel(self, handshake_id):
+        pass
+
+class LocalIdentityProvider(IdentityProvider):
+    """In-process stand-in for DigiD
+
+    ``users`` is anything supporting ``bsn in users``, such as a dict of
+    profiles or a ProfileStore. Every poll moves a handshake one state
+    further, so a login completes in three polls without waiting on anything.
+    """
+
+    def __init__(self, users=None):
+        self.users = LOCAL_USERS if users is None else users
+        self._handshakes = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def start(self, bsn):
+        with self._lock:
+            handshake_id = next(self._ids)
+            self._handshakes[handshake_id] = (REDIRECTING, bsn)
+        return handshake_id
+
+    def poll(self, handshake_id):
+        with self._lock:
+            state, bsn = self._handshakes.get(handshake_id, (FAILED, None))
+
+            if state == REDIRECTING:
+                state = CONNECTING
+            elif state == CONNECTING:
+                state = AUTHENTICATED if bsn in self.users else FAILED
+
+            if state in FINISHED_STATES:
+                self._handshakes.pop(handshake_id, None)
+            else:
+                self._handshakes[handshake_id] = (state, bsn)
+
+        if state == AUTHENTICATED:
+            return LoginStatus(state, bsn, time.strftime("%Y-%m-%d %H:%M:%S"))
+        return LoginStatus(state, None, None)
+
+    def cancel(self, handshake_id):
+        with self._lock:
+            self._handshakes.pop(handshake_id, None)
+
+def advance_login(provider, handshake_id):
+    """Poll a handshake for as long as it keeps making progress
+
+    Returns the last status seen. An unfinished status means the provider
+    is waiting on something and the handshake should be polled again later.
+    """
+    status = provider.poll(handshake_id)
+    while status.state not in FINISHED_STATES:
+        next_status = provider.poll(handshake_id)
+        if next_status.state == status.state:
+            break
+        status = next_status
+    return status
+
+def benchmark_login(provider, bsn=DEMO_BSN, logins=10000):
+    """Latency percentiles in milliseconds of complete login handshakes"""
+    latencies = []
+    for _ in range(logins):
+        started = time.perf_counter()
+        status = advance_login(provider, provider.start(bsn))
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status.state != AUTHENTICATED:
+            raise RuntimeError(f"login ended in state {status.state}")
+
+    latencies.sort()
+    return {
+        "logins": logins,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "p99_ms": latencies[int(len(latencies) * 0.99)],
+        "max_ms": latencies[-1],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark login handshakes against the local identity provider")
+    parser.add_argument("--logins", type=int, default=10000)
+    args = parser.parse_args()
+
+    for key, value in benchmark_login(LocalIdentityProvider(), logins=args.logins).items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+from catalogue import CatalogueWriter
+from eligibility import eligibility_problem
+
+CHUNK_SIZE = 1 << 16
+
+# Characters of one array item buffered at most before it is given up on
+MAX_ITEM_SIZE = 1 << 20
+
+# Stands in for a record that does not parse, at the line it starts on, so
+# it is counted as invalid
+MalformedLine = namedtuple("MalformedLine", ["line", "error"])
+
+# Strings, brackets and commas, and a quote opening a string not complete yet
+STRUCTURE = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{},"]')
+
+# Where an object item may start after a separator
+OBJECT_ITEM = re.compile(r",\s*(?=\{)")
+
+def scan_item(buffer, start, depth=0):
+    """Find the "," or "]" ending the array item at start, looking only at brackets and strings
+
+    Returns (True, offset of that separator, 0), or (False, offset to
+    resume from, depth there) when the buffer ends first. Malformed items
+    can be scanned too, so reading resumes after them.
+    """
+    for match in STRUCTURE.finditer(buffer, start):
+        token = match.group()
+        if token == '"':
+            return False, match.start(), depth
+        if token in "[{":
+            depth += 1
+        elif token in "]}":
+            if depth:
+                depth -= 1
+            elif token == "]":
+                return True, match.start(), 0
+        elif token == "," and not depth:
+            return True, match.start(), 0
+    return False, len(buffer), depth
+
+def iter_json_array(f, max_item=MAX_ITEM_SIZE):
+    """Yield the items of a top-level JSON array one at a time
+
+    An item that does not parse is yielded as a MalformedLine and skipped:
+    its brackets are followed to the separator after it, or, when that
+    takes more than max_item characters (a stray quote turns the rest of
+    the file inside out), reading resumes at the next "{" after a comma
+    that parses as an item. An item longer than max_item counts as
+    malformed too, so memory stays bounded whatever the file holds.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    line = 1
+    started = False
+    ended = False
+    eof = False
+    # While skipping a malformed item, which stays buffered from position:
+    # the offset its scan resumes at and the bracket depth there
+    skipping = None
+    searching = False
+
+    while True:
+        if skipping is not None:
+            offset, depth = skipping
+            found, offset, depth = scan_item(buffer, offset, depth)
+            if found:
+                position, skipping = offset, None
+            elif eof or len(buffer) - position > max_item:
+                # Its end is lost; search past its first character instead
+                position, skipping, searching = position + 1, None, True
+            else:
+                skipping = (offset, depth)
+
+        if searching:
+            position, searching = resync(decoder, buffer, position, eof, max_item)
+            if searching and eof:
+                return
+
+        if skipping is None and not searching:
+            # Skip whitespace, the brackets and separators between items
+            while position < len(buffer):
+                char = buffer[position]
+                if ended and not char.isspace():
+                    break
+                if char == "[" and not started:
+                    started = True
+                elif char == "]" and started:
+                    # Only the end of the array when nothing but whitespace follows
+                    ended = True
+                elif char not in " \t\r\n,":
+                    break
+                position += 1
+
+            if ended and position < len(buffer):
+                yield MalformedLine(line + buffer.count("\n", 0, position), "content after the end of the array")
+                ended, searching = False, True
+                continue
+
+            if position < len(buffer):
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError as exc:
+                    # Only a complete item is malformed; otherwise it is read further
+                    if eof or len(buffer) - position > max_item or scan_item(buffer, position)[0]:
+                        yield MalformedLine(line + buffer.count("\n", 0, position), exc.msg)
+                        skipping = (position, 0)
+                        continue
+                else:
+                    yield item
+                    position = end
+                    continue
+            elif eof:
+                return
+
+        chunk = f.read(CHUNK_SIZE)
+        eof = not chunk
+        line += buffer.count("\n", 0, position)
+        buffer = buffer[position:] + chunk
+        if skipping is not None:
+            skipping = (skipping[0] - position, skipping[1])
+        position = 0
+
+def resync(decoder, buffer, position, eof, max_item=MAX_ITEM_SIZE):
+    """(offset, still searching) after looking for the next object item from position
+
+    An object counts as the next item when it parses and a "," or "]"
+    follows it. Without one in the buffer the offset is where to search
+    again once more has been read.
+    """
+    for match in OBJECT_ITEM.finditer(buffer, position):
+        start = match.end()
+        if not eof and len(buffer) - start <= max_item and not scan_item(buffer, start)[0]:
+            # The candidate runs past the buffer; look again with more of it
+            return match.start(), True
+        try:
+            _, end = decoder.raw_decode(buffer, start)
+        except json.JSONDecodeError:
+            continue
+        rest = buffer[end:end + 64].lstrip()
+        if rest[:1] in (",", "]"):
+            return start, False
+    # Keep a trailing comma, whose item may still be coming
+    comma = buffer.rfind(",", position)
+    return (comma if comma >= 0 and not buffer[comma + 1:].strip() else len(buffer)), True
+
+def iter_json_lines(f):
+    """Yield one JSON value per non-empty line, or a MalformedLine for a line that is not JSON"""
+    for number, line in enumerate(f, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield MalformedLine(number, exc.msg)
+
+def iter_records(path):
+    """Records of a JSON array or JSONL export, read incrementally"""
+    with open(path, "r", encoding="utf-8") as f:
+        first = ""
+        while not first.strip():
+            first = f.read(1)
+            if not first:
+                return
+        f.seek(0)
+        if first == "[":
+            yield from iter_json_array(f)
+        else:
+            yield from iter_json_lines(f)
+
+def validate_program(record):
+    """Reason a record does not fit the program schema, or None when it does"""
+    if isinstance(record, MalformedLine):
+        return f"line {record.line} is not valid JSON: {record.error}"
+    if not isinstance(record, dict):
+        return "not an object"
+    for field in ("short_name", "long_name", "description"):
+        if not isinstance(record.get(field), str):
+            return f"{field} is missing or not a string"
+    if not record["short_name"].strip():
+        return "short_name is empty"
+    for field in ("criteria", "benefits"):
+        values = record.get(field)
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            return f"{field} is missing or not a list of strings"
+    return eligibility_problem(record.get("eligibility"))
+
+class SeenNames:
+    """Set of short_names kept in a temporary SQLite file instead of memory"""
+
+    def __init__(self):
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode = OFF")
+        self.db.execute("PRAGMA synchronous = OFF")
+        self.db.execute("CREATE TABLE seen (short_name TEXT PRIMARY KEY)")
+
+    def add(self, name):
+        """Add a name, returning False when it was already present"""
+        cursor = self.db.execute("INSERT OR IGNORE INTO seen VALUES (?)", (name,))
+        return cursor.rowcount == 1
+
+    def close(self):
+        self.db.close()
+        os.remove(self.path)
+
+def ingest(source, target, progress_every=100000, log=sys.stderr):
+    """Stream programs from source into a binary catalogue at target"""
+    stats = {"read": 0, "written": 0, "invalid": 0, "duplicates": 0}
+    seen = SeenNames()
+    started = time.perf_counter()
+
+    try:
+        with CatalogueWriter(target) as writer:
+            for record in iter_records(source):
+                stats["read"] += 1
+
+                error = validate_program(record)
+                if error:
+                    stats["invalid"] += 1
+                    print(f"record {stats['read']}: {error}", file=log)
+                elif not seen.add(record["short_name"]):
+                    stats["duplicates"] += 1
+                else:
+                    writer.add(record)
+                    stats["written"] += 1
+
+                if progress_every and stats["read"] % progress_every == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{stats['read']} records, {stats['read'] / elapsed:.0f} records/s", file=log)
+    finally:
+        seen.close()
+
+    stats["seconds"] = time.perf_counter() - started
+    stats["records_per_second"] = stats["read"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a JSON array or JSONL program export into a binary catalogue")
+    parser.add_argument("source")
+    parser.add_argument("target", nargs="?", default="data.bin")
+    parser.add_argument("--progress-every", type=int, default=100000)
+    args = parser.parse_args()
+
+    stats = ingest(args.source, args.target, args.progress_every)
+    print(
+        f"{stats['written']} programs written to {args.target} "
+        f"({stats['invalid']} invalid, {stats['duplicates']} duplicates) "
+        f"in {stats['seconds']:.1f}s, {stats['records_per_second']:.0f} records/s"
+    )
@@ -0,0 +1,264 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from catalogue import refresh_binary
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# States of a worker
+STARTING = "starting"
+LIVE = "live"
+DRAINING = "draining"
+STOPPED = "stopped"
+
+def prepare_catalogue(json_path, binary_path):
+    """Convert the catalogue to the memory-mapped format when the JSON is newer
+
+    Workers are started with CATALOGUE_BINARY_PATH pointing at the same file,
+    so they all map it and the operating system keeps a single copy of it in
+    the page cache. Converting before they start spares them doing it at once.
+    """
+    if os.path.exists(json_path):
+        refresh_binary(json_path, binary_path)
+
+def worker_path(path, port):
+    """Per-worker variant of a file path: applications.jsonl becomes applications-8502.jsonl"""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{port}{ext}"
+
+def rank_workers(client, workers):
+    """Workers ordered by rendezvous hash of the client address
+
+    A client keeps landing on the same worker, and when a worker goes away
+    only its own clients move, each to its next-ranked worker.
+    """
+    def weight(worker):
+        return hashlib.blake2b(f"{client}|{worker.port}".encode(), digest_size=8).digest()
+    return sorted(workers, key=weight, reverse=True)
+
+class Worker:
+    """One streamlit process on its own local port
+
+    The application log and the metrics file are written by one process
+    only, so every worker gets its own through APPLICATIONS_PATH and
+    METRICS_PATH, named after its port.
+    """
+
+    def __init__(self, port, app, host="127.0.0.1"):
+        self.port = port
+        self.app = app
+        self.host = host
+        self.state = STOPPED
+        self.process = None
+        self.connections = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    def environment(self):
+        env = dict(os.environ)
+        env.setdefault("CATALOGUE_BINARY_PATH", "data.bin")
+        env["APPLICATIONS_PATH"] = worker_path(env.get("APPLICATIONS_PATH", "applications.jsonl"), self.port)
+        env["METRICS_PATH"] = worker_path(env.get("METRICS_PATH", "metrics.prom"), self.port)
+        return env
+
+    def start(self):
+        self.process = subprocess.Popen([
+            sys.executable, "-m", "streamlit", "run", self.app,
+            "--server.port", str(self.port),
+            "--server.address", self.host,
+            "--server.headless", "true",
+        ], cwd=HERE, env=self.environment())
+        self.state = STARTING
+
+    async def wait_healthy(self, timeout=60.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                return False
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+                writer.write(f"GET /_stcore/health HTTP/1.1\r\nHost: {self.host}\r\nConnection: close\r\n\r\n".encode())
+                await writer.drain()
+                status = await reader.readline()
+                writer.close()
+                if b" 200 " in status:
+                    self.state = LIVE
+                    return True
+            except OSError:
+                pass
+            await asyncio.sleep(0.25)
+        return False
+
+    async def stop(self, drain_timeout=30.0):
+        """Take no new connections, wait for open ones to finish, then terminate"""
+        self.state = DRAINING
+        try:
+            await asyncio.wait_for(self.idle.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        self.state = STOPPED
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.process.wait, 10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def opened(self):
+        self.connections += 1
+        self.idle.clear()
+
+    def closed(self):
+        self.connections -= 1
+        if self.connections == 0:
+            self.idle.set()
+
+class Launcher:
+    """N streamlit workers behind a sticky-session TCP proxy
+
+    Connections are forwarded as raw bytes, so Streamlit's websocket passes
+    through untouched. SIGHUP restarts the workers one at a time, each
+    draining its open connections first; SIGTERM and SIGINT drain and stop
+    all of them. Only processes started by the launcher are ever signalled.
+    ``prepare`` runs before the workers start and before every rolling
+    restart, to refresh the shared catalogue.
+    """
+
+    def __init__(self, workers, port, worker_port, host="0.0.0.0", app="app.py", drain_timeout=30.0, prepare=None):
+        self.host = host
+        self.port = port
+        self.drain_timeout = drain_timeout
+        self.prepare = prepare
+        self.workers = [Worker(worker_port + i, app) for i in range(workers)]
+        self._restarting = False
+        self._stopped = asyncio.Event()
+        self._tasks = set()
+
+    def live_workers(self):
+        return [worker for worker in self.workers if worker.state == LIVE]
+
+    async def handle_client(self, client_reader, client_writer):
+        client = client_writer.get_extra_info("peername")[0]
+        for worker in rank_workers(client, self.live_workers()):
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(worker.host, worker.port)
+                break
+            except OSError:
+                continue
+        else:
+            client_writer.close()
+            return
+
+        worker.opened()
+        try:
+            await asyncio.gather(
+                self._pipe(client_reader, upstream_writer),
+                self._pipe(upstream_reader, client_writer),
+            )
+        finally:
+            worker.closed()
+
+    async def _pipe(self, reader, writer):
+        try:
+            while data := await reader.read(65536):
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start_worker(self, worker):
+        worker.start()
+        if not await worker.wait_healthy():
+            print(f"Worker on port {worker.port} did not become healthy", file=sys.stderr)
+            return False
+        print(f"Worker on port {worker.port} is live (pid {worker.process.pid})", file=sys.stderr)
+        return True
+
+    async def run_prepare(self):
+        """Run ``prepare`` in a thread, so the proxy keeps forwarding meanwhile"""
+        if self.prepare:
+            await asyncio.get_running_loop().run_in_executor(None, self.prepare)
+
+    async def rolling_restart(self):
+        """Restart the workers one at a time, stopping at the first that does not come back"""
+        if self._restarting:
+            return
+        self._restarting = True
+        try:
+            await self.run_prepare()
+            for worker in self.workers:
+                # Never take down the last live worker before its replacement is up
+                if worker.state == LIVE and len(self.live_workers()) == 1 and len(self.workers) > 1:
+                    continue
+                print(f"Restarting worker on port {worker.port}", file=sys.stderr)
+                await worker.stop(self.drain_timeout)
+                if not await self.start_worker(worker):
+                    # The new code or catalogue is likely broken; keep the old workers serving
+                    print("Rolling restart stopped; the remaining workers keep running", file=sys.stderr)
+                    break
+        finally:
+            self._restarting = False
+
+    async def watch_workers(self):
+        """Restart workers that exited on their own"""
+        while not self._stopped.is_set():
+            await asyncio.sleep(1.0)
+            for worker in self.workers:
+                if worker.state == LIVE and worker.process.poll() is not None:
+                    print(f"Worker on port {worker.port} exited with {worker.process.returncode}", file=sys.stderr)
+                    worker.state = STOPPED
+                    self._spawn(self.start_worker(worker))
+
+    def _spawn(self, coroutine):
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def shutdown(self):
+        self._stopped.set()
+        await asyncio.gather(*(worker.stop(self.drain_timeout) for worker in self.workers))
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        await self.run_prepare()
+        await asyncio.gather(*(self.start_worker(worker) for worker in self.workers))
+
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, backlog=1024)
+        print(f"Proxy listening on http://{self.host}:{self.port} for {len(self.live_workers())} workers", file=sys.stderr)
+
+        loop.add_signal_handler(signal.SIGHUP, lambda: self._spawn(self.rolling_restart()))
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, self._stopped.set)
+
+        watcher = loop.create_task(self.watch_workers())
+        async with server:
+            await self._stopped.wait()
+            server.close()
+            print("Draining workers", file=sys.stderr)
+            await self.shutdown()
+        watcher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run several app workers behind a sticky-session proxy")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8501)
+    parser.add_argument("--worker-port", type=int, default=None, help="port of the first worker (default: port + 1)")
+    parser.add_argument("--app", default="app.py")
+    parser.add_argument("--drain-timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    launcher = Launcher(
+        args.workers, args.port, args.worker_port or args.port + 1, args.host, args.app, args.drain_timeout,
+        prepare=lambda: prepare_catalogue(os.path.join(HERE, "data.json"), os.path.join(HERE, "data.bin")),
+    )
+    asyncio.run(launcher.serve())
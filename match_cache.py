@@ -0,0 +1,88 @@
+import threading
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+MatchResult = namedtuple("MatchResult", ["catalogue", "scores", "fingerprint"])
+
+class MatchCache:
+    """Per-profile match score vectors with stale-while-revalidate refreshes
+
+    ``score(index, profile)`` computes the scores of every program for a
+    profile and ``fingerprint(profile)`` summarizes the profile fields the
+    scores depend on. A result is fresh while both the catalogue version and
+    the fingerprint are unchanged. A stale result is still returned, together
+    with the catalogue it was computed against, while a background worker
+    recomputes it. Only a profile that was never scored is scored inline.
+    """
+
+    def __init__(self, score, fingerprint, load_profile, max_profiles=10000, workers=1):
+        self.score = score
+        self.fingerprint = fingerprint
+        self.load_profile = load_profile
+        self.max_profiles = max_profiles
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="match-cache")
+
+    def get(self, key, profile, catalogue):
+        """Match result for a profile, computed inline only on a cold miss"""
+        fingerprint = self.fingerprint(profile)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+
+        if result is None:
+            self.misses += 1
+            return self._compute(key, profile, catalogue)
+
+        if result.catalogue.version == catalogue.version and result.fingerprint == fingerprint:
+            self.hits += 1
+        else:
+            self.stale += 1
+            self.refresh(key, catalogue)
+        return result
+
+    def _compute(self, key, profile, catalogue):
+        result = MatchResult(catalogue, self.score(catalogue.index, profile), self.fingerprint(profile))
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_profiles:
+                self._entries.popitem(last=False)
+        return result
+
+    def refresh(self, key, catalogue):
+        """Recompute a profile's scores on the background worker"""
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._refresh, key, catalogue)
+
+    def _refresh(self, key, catalogue):
+        try:
+            profile = self.load_profile(key)
+            if profile is not None:
+                self._compute(key, profile, catalogue)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def catalogue_changed(self, catalogue):
+        """Re-score every cached profile against a newly loaded catalogue"""
+        with self._lock:
+            keys = list(self._entries)
+        for key in keys:
+            self.refresh(key, catalogue)
+
+    def profile_changed(self, key, catalogue):
+        """Re-score a profile whose fields were updated"""
+        with self._lock:
+            known = key in self._entries
+        if known:
+            self.refresh(key, catalogue)
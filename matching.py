@@ -0,0 +1,323 @@
+import heapq
+
+import numpy as np
+
+from autocomplete import Autocomplete
+from catalogue import CatalogueStore
+from eligibility import EligibilityIndex
+from rules import RuleSet
+from search import SearchIndex, search_tokens
+from semantic import SemanticIndex, profile_description
+
+# Filter and score rules live in rules.json; these views keep the old names
+RULES = RuleSet.load()
+
+FILTER_KEYWORD_GROUPS = {
+    key: [(trigger, group.keywords) for trigger, group in options]
+    for key, options in RULES.filters.items()
+}
+
+DEFAULT_FILTER_VALUES = RULES.default_filter_values
+
+# Free-text search falls back to the semantically nearest programs when no
+# program contains any of the query terms
+SEMANTIC_SEARCH_LIMIT = 50
+SEMANTIC_SEARCH_MIN_SIMILARITY = 0.15
+
+def program_text(program):
+    """Lowercased searchable text of a program"""
+    return ' '.join([
+        program.get('short_name', '').lower(),
+        program.get('long_name', '').lower(),
+        program.get('description', '').lower(),
+        ' '.join(program.get('criteria', [])).lower(),
+        ' '.join(program.get('benefits', [])).lower()
+    ])
+
+def build_program_index(programs):
+    """Build the keyword bitset, eligibility, search, semantic and autocomplete index for a catalogue"""
+    texts = []
+    documents = []
+    names = []
+    eligibilities = []
+    for program in programs:
+        texts.append(program_text(program))
+        documents.append(search_tokens(program))
+        names.append({'short_name': program.get('short_name'), 'long_name': program.get('long_name')})
+        eligibilities.append(program.get('eligibility'))
+    
+    # Keyword groups are matched as substrings, so every text is scanned once
+    # per group here instead of once per keyword per rerun.
+    group_bits = RULES.group_bits(texts)
+    search = SearchIndex(documents)
+    
+    return {
+        'size': len(texts),
+        'group_bits': group_bits,
+        'score_matrix': RULES.score_matrix(group_bits),
+        'eligibility': EligibilityIndex(eligibilities),
+        'search': search,
+        # Only built when rules.json blends in semantic similarity
+        'semantic': SemanticIndex(search) if RULES.semantic_weight else None,
+        'autocomplete': Autocomplete(names),
+    }
+
+def active_filter_keywords(filters):
+    """Keyword lists of the filter groups that are active for the given filters"""
+    return [group.keywords for group in RULES.active_filter_groups(filters)]
+
+def filters_all_default(filters):
+    """True when none of the filters narrows the catalogue"""
+    return RULES.filters_all_default(filters)
+
+def filter_program_ids(index, filters=None, profile=None):
+    """Catalogue positions of the programs passing the filters, in catalogue order
+    
+    With a profile, programs whose structured eligibility rules it out are
+    dropped as well.
+    """
+    return filter_program_id_array(index, filters, profile).tolist()
+
+def filter_program_id_array(index, filters=None, profile=None):
+    """filter_program_ids as an int32 array, a tenth of the memory of a list"""
+    passing = None
+    mask = RULES.filter_mask(filters)
+    if mask:
+        # A program passes when it matches any keyword of any active filter group
+        passing = (index['group_bits'] & np.uint64(mask)) != 0
+    
+    eligible = index['eligibility'].mask(profile)
+    if eligible is not None:
+        passing = eligible if passing is None else passing & eligible
+    
+    if passing is None:
+        return np.arange(index['size'], dtype=np.int32)
+    return np.flatnonzero(passing).astype(np.int32)
+
+def filter_programs(programs, user_data, filters=None, index=None):
+    """Filter programs based on user criteria and additional filters
+    
+    Without the catalogue index, only the parts of it filtering reads are
+    built: the eligibility index, and the keyword bitset once a filter is
+    set.
+    """
+    if index is None:
+        index = {
+            'size': len(programs),
+            'eligibility': EligibilityIndex([program.get('eligibility') for program in programs]),
+        }
+    restricted = index['eligibility'].mask(user_data) is not None
+    
+    if not restricted:
+        if not filters or filters_all_default(filters):
+            return programs
+        
+        if not active_filter_keywords(filters):
+            return list(programs)
+    
+    if 'group_bits' not in index:
+        index['group_bits'] = RULES.group_bits([program_text(program) for program in programs])
+    
+    return [programs[i] for i in filter_program_ids(index, filters, user_data)]
+
+def normalize_filters(filters):
+    """Hashable form of a filters dict with unset and default values dropped"""
+    if not filters:
+        return ()
+    return tuple(sorted(
+        (key, str(value).lower())
+        for key, value in filters.items()
+        if value and value not in DEFAULT_FILTER_VALUES
+    ))
+
+SCORE_KEYWORD_GROUPS = {name: group.keywords for name, group in RULES.score_groups}
+
+SCORE_GROUP_NAMES = RULES.score_group_names
+
+MAX_MATCH_SCORE = RULES.max_match_score
+
+def clean_profile(profile):
+    """Profile from outside the app with numeric and text fields coerced; ValueError when one is invalid"""
+    return RULES.clean_profile(profile)
+
+def profile_score_groups(user_data):
+    """Names of the score keyword groups that count for a user profile"""
+    return RULES.profile_groups(user_data)
+
+def profile_score_vector(user_data):
+    """0/1 vector over SCORE_GROUP_NAMES selecting the groups that count for a profile"""
+    return RULES.profile_vector(user_data)
+
+def build_score_matrix(texts):
+    """Programs x score-group matrix, 1 where the program text hits the group"""
+    return RULES.score_matrix(RULES.group_bits(texts))
+
+def match_percentages(hits):
+    """Convert group hit counts to the displayed match percentage"""
+    return np.maximum(25, (np.asarray(hits) * 100) // MAX_MATCH_SCORE)  # Minimum 25% match
+
+def calculate_match_score(program, user_data, index=None):
+    """Calculate match percentage for a program
+    
+    Given the catalogue index, semantic similarity is blended in as in
+    score_profiles, so a catalogue program gets the score it has there.
+    """
+    percentage = max(25, RULES.text_score(program_text(program), user_data) * 100 // MAX_MATCH_SCORE)
+    semantic = index.get('semantic') if index is not None else None
+    if semantic is None or not profile_description(user_data):
+        return percentage
+    
+    similarity = np.clip(semantic.embed_document(search_tokens(program)) @ semantic.embed(profile_description(user_data)), 0, 1)
+    return int(semantic_percentages(np.array(percentage), similarity))
+
+def semantic_percentages(percentages, similarity):
+    """Raise match percentages by semantic similarity
+    
+    A program moves from its keyword percentage towards 100% by
+    ``semantic_weight`` times its similarity to the profile's description.
+    The keyword score stays a floor, and a program the keywords missed can
+    still rank when its text is about the same thing.
+    """
+    return percentages + np.rint(RULES.semantic_weight * similarity * (100 - percentages)).astype(percentages.dtype)
+
+def blend_semantic(index, percentages, profiles, rows=None):
+    """semantic_percentages of programs x profiles; profiles without a description keep their scores"""
+    semantic = index.get('semantic')
+    if semantic is None:
+        return percentages
+    
+    descriptions = [profile_description(profile) for profile in profiles]
+    if not any(descriptions):
+        return percentages
+    
+    # Profiles in a batch often share a description; embed each one once.
+    # An empty description embeds as zeros, which adds nothing.
+    embedded = {description: semantic.embed(description) for description in set(descriptions)}
+    vectors = np.array([embedded[description] for description in descriptions])
+    return semantic_percentages(percentages, semantic.similarities(vectors, rows))
+
+def score_profiles(index, profiles, rows=None):
+    """Programs x profiles match percentages, for all programs or the given rows"""
+    matrix = index['score_matrix'] if rows is None else index['score_matrix'][rows]
+    vectors = np.array([profile_score_vector(profile) for profile in profiles]).reshape(len(profiles), -1)
+    return blend_semantic(index, match_percentages(matrix @ vectors.T), profiles, rows)
+
+def score_programs(index, user_data):
+    """Match percentages of every program in the index for one user profile"""
+    return score_profiles(index, [user_data])[:, 0]
+
+def profile_fingerprint(user_data):
+    """Summary of the profile fields that match scores depend on"""
+    description = profile_description(user_data) if RULES.semantic_weight else None
+    return (tuple(profile_score_groups(user_data)), description)
+
+def search_program_ids(index, query, allowed=None):
+    """Program ids matching a free-text query, most relevant first
+    
+    BM25 over the catalogue terms. When that finds nothing, e.g. because
+    no program uses the word "warmtenet", the semantically nearest allowed
+    programs are returned instead.
+    """
+    program_ids = index['search'].search(query, allowed=allowed)
+    semantic = index.get('semantic')
+    if program_ids or semantic is None:
+        return program_ids
+    
+    program_ids, _ = semantic.search(
+        semantic.embed(query), SEMANTIC_SEARCH_LIMIT, allowed, SEMANTIC_SEARCH_MIN_SIMILARITY)
+    return program_ids.tolist()
+
+def top_ranked(program_ids, scores, k):
+    """The k best-scoring program ids, ties broken by catalogue order"""
+    if not isinstance(program_ids, np.ndarray):
+        return heapq.nsmallest(k, program_ids, key=lambda i: (-scores[i], i))
+    if k <= 0:
+        return []
+    values = scores[program_ids]
+    if len(program_ids) > k:
+        # Only ids scoring at least the k-th best score can make the cut
+        keep = values >= np.partition(values, len(values) - k)[len(values) - k]
+        program_ids, values = program_ids[keep], values[keep]
+    return program_ids[np.lexsort((program_ids, -values))[:k]].tolist()
+
+def ranked_page(cursor, program_ids, start_idx, end_idx):
+    """Program ids for one result page, ranked by match score
+    
+    The ranked prefix is kept in the cursor and grown geometrically, so moving
+    to the next page reuses it instead of ranking the whole result list again.
+    """
+    if len(cursor['ranked']) < end_idx:
+        k = max(end_idx, 2 * len(cursor['ranked']))
+        cursor['ranked'] = top_ranked(program_ids, cursor['scores'], k)
+    
+    return cursor['ranked'][start_idx:end_idx]
+
+
+class MatchingEngine:
+    """Filtering, scoring and ranking over a shared, hot-reloading catalogue"""
+    
+    def __init__(self, store):
+        self.store = store
+    
+    @classmethod
+    def from_path(cls, path="data.json", binary_path=None):
+        return cls(CatalogueStore(path, prepare=build_program_index, binary_path=binary_path))
+    
+    def match(self, profile, filters=None, limit=10):
+        """Ranked programs for one profile"""
+        return self.match_many([(profile, filters, limit)])[0]
+    
+    def autocomplete(self, prefix, limit=8):
+        """Program names completing a typed prefix, allowing for typos"""
+        catalogue = self.store.current()
+        return {
+            'catalogue_version': catalogue.version,
+            'suggestions': [
+                {'id': program_id, 'field': field, 'name': name, 'distance': distance}
+                for program_id, field, name, distance in catalogue.index['autocomplete'].lookup(prefix, limit)
+            ],
+        }
+    
+    def score(self, profile, programs):
+        """calculate_match_score of each given program for one profile"""
+        index = self.store.current().index
+        return [calculate_match_score(program, profile, index) for program in programs]
+    
+    def match_many(self, requests):
+        """Ranked programs for a batch of (profile, filters, limit) requests
+        
+        All profiles are scored with one matrix product against the same
+        catalogue version, and each distinct filter combination is resolved
+        once per batch for each distinct set of eligibility-relevant profile
+        values.
+        """
+        catalogue = self.store.current()
+        index = catalogue.index
+        programs = catalogue.programs
+        
+        scores = score_profiles(index, [profile for profile, _, _ in requests])
+        
+        matched = {}
+        responses = []
+        for j, (profile, filters, limit) in enumerate(requests):
+            key = (normalize_filters(filters), index['eligibility'].profile_key(profile))
+            if key not in matched:
+                matched[key] = filter_program_ids(index, filters, profile)
+            
+            column = scores[:, j]
+            results = []
+            for program_id in top_ranked(matched[key], column, limit):
+                program = programs[program_id]
+                results.append({
+                    'id': program_id,
+                    'short_name': program.get('short_name'),
+                    'long_name': program.get('long_name'),
+                    'score': int(column[program_id]),
+                })
+            
+            responses.append({
+                'catalogue_version': catalogue.version,
+                'total': len(matched[key]),
+                'results': results,
+            })
+        return responses
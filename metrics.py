@@ -0,0 +1,230 @@
+import bisect
+import functools
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class _Timer:
+    __slots__ = ("record", "name", "started")
+
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        timings = self.record["timings"]
+        timings[self.name] = timings.get(self.name, 0.0) + time.perf_counter() - self.started
+        return False
+
+class _Rerun:
+    __slots__ = ("metrics", "record")
+
+    def __init__(self, metrics, record):
+        self.metrics = metrics
+        self.record = record
+
+    def __enter__(self):
+        self.metrics._local.record = self.record
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._local.record = None
+        self.metrics._finish(self.record)
+        return False
+
+class Metrics:
+    """Sampled per-rerun timings and counters, exported as Prometheus text
+
+    A rerun is sampled with probability ``sample_rate``. Only inside a
+    sampled rerun do timers and counters record anything; everywhere else
+    ``timer`` returns a shared no-op context and ``count`` returns after a
+    single thread-local lookup, so the instrumentation can stay in place
+    with sampling off. Finished reruns are aggregated into histograms, kept
+    in a short history for the admin panel and written to ``path`` at most
+    once per ``flush_interval`` seconds.
+    """
+
+    def __init__(self, sample_rate=0.0, path="metrics.prom", history=50, flush_interval=10.0, prefix="hackwerk"):
+        self.sample_rate = sample_rate
+        self.path = path
+        self.flush_interval = flush_interval
+        self.prefix = prefix
+        self.history = deque(maxlen=history)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._reruns = {}
+        self._counters = {}
+        self._histograms = {}
+        self._flushed_at = time.monotonic()
+
+    @classmethod
+    def from_env(cls):
+        """Configured by METRICS_SAMPLE_RATE (0 disables) and METRICS_PATH, one file per process"""
+        return cls(
+            sample_rate=float(os.environ.get("METRICS_SAMPLE_RATE", "0")),
+            path=os.environ.get("METRICS_PATH", "metrics.prom"),
+        )
+
+    def rerun(self, kind="script", force=False):
+        """Context for one script or fragment run; nested runs count toward the outer one"""
+        with self._lock:
+            self._reruns[kind] = self._reruns.get(kind, 0) + 1
+        if getattr(self._local, "record", None) is not None:
+            return NULL_TIMER
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return NULL_TIMER
+        return _Rerun(self, {"kind": kind, "time": time.time(), "started": time.perf_counter(),
+                             "timings": {}, "counts": {}})
+
+    def runs(self, kind, force=None):
+        """Decorator that makes every call one ``rerun(kind)``; ``force()`` is asked per call"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.rerun(kind, force=force() if force else False):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def timer(self, name):
+        """Context that adds its duration to ``name`` in the current sampled rerun"""
+        record = getattr(self._local, "record", None)
+        if record is None:
+            return NULL_TIMER
+        return _Timer(record, name)
+
+    def timed(self, name):
+        """Decorator form of ``timer``"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def count(self, name, amount=1):
+        """Add to a counter of the current sampled rerun"""
+        record = getattr(self._local, "record", None)
+        if record is not None:
+            counts = record["counts"]
+            counts[name] = counts.get(name, 0) + amount
+
+    def count_calls(self, owner, attribute):
+        """Replace ``owner.attribute`` with a wrapper that counts its calls
+
+        Safe to call on every script run; an already wrapped attribute is left alone.
+        """
+        fn = getattr(owner, attribute)
+        if getattr(fn, "_counted_by", None) is self:
+            return
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            self.count(attribute)
+            return fn(*args, **kwargs)
+        wrapper._counted_by = self
+        setattr(owner, attribute, wrapper)
+
+    def _finish(self, record):
+        record["total"] = time.perf_counter() - record.pop("started")
+        with self._lock:
+            self.history.append(record)
+            for name, seconds in [("total", record["total"])] + list(record["timings"].items()):
+                self._observe((record["kind"], name), seconds)
+            for name, amount in record["counts"].items():
+                self._counters[name] = self._counters.get(name, 0) + amount
+
+            now = time.monotonic()
+            if self.path and now - self._flushed_at >= self.flush_interval:
+                self._flushed_at = now
+                text = self._render()
+            else:
+                text = None
+        if text is not None:
+            self._write(text)
+
+    def _observe(self, key, seconds):
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = [[0] * (len(BUCKETS) + 1), 0.0, 0]
+        histogram[0][bisect.bisect_left(BUCKETS, seconds)] += 1
+        histogram[1] += seconds
+        histogram[2] += 1
+
+    def render(self):
+        """Current metrics in the Prometheus text exposition format"""
+        with self._lock:
+            return self._render()
+
+    def _render(self):
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_reruns_total Script and fragment runs, sampled or not.",
+            f"# TYPE {p}_reruns_total counter",
+        ]
+        lines += [f'{p}_reruns_total{{kind="{kind}"}} {count}' for kind, count in sorted(self._reruns.items())]
+
+        lines += [
+            f"# HELP {p}_sampled_calls_total Calls counted during sampled runs.",
+            f"# TYPE {p}_sampled_calls_total counter",
+        ]
+        lines += [f'{p}_sampled_calls_total{{name="{name}"}} {count}' for name, count in sorted(self._counters.items())]
+
+        lines += [
+            f"# HELP {p}_stage_seconds Time spent per stage during sampled runs.",
+            f"# TYPE {p}_stage_seconds histogram",
+        ]
+        for (kind, stage), (buckets, total, count) in sorted(self._histograms.items()):
+            labels = f'kind="{kind}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{p}_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{p}_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{p}_stage_seconds_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{p}_stage_seconds_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+    def _write(self, text):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            # Metrics must never break a page view
+            pass
+
+    def flush(self):
+        """Write the metrics file now"""
+        if self.path:
+            self._write(self.render())
+
+    def recent(self, count=None):
+        """The last ``count`` finished sampled runs, newest first"""
+        with self._lock:
+            records = list(self.history)
+        records.reverse()
+        return records[:count] if count else records
+
+# Shared by every session and script run of the process
+METRICS = Metrics.from_env()
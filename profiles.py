@@ -0,0 +1,136 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Fields stored as columns and loaded with every profile. Everything else
+# (contact details and the like) lives in a JSON column that is only read
+# when one of those fields is accessed.
+CORE_FIELDS = (
+    "bsn", "kvk", "name", "company", "business_type", "stage",
+    "location", "employees", "annual_revenue", "sector",
+)
+
+class Profile(Mapping):
+    """Read-only company profile with lazily loaded detail fields"""
+
+    def __init__(self, store, core):
+        self._store = store
+        self._core = core
+        self._details = None
+
+    @property
+    def key(self):
+        return self._core["bsn"]
+
+    def _load_details(self):
+        if self._details is None:
+            self._details = self._store._load_details(self.key)
+        return self._details
+
+    def __getitem__(self, field):
+        if field in self._core:
+            return self._core[field]
+        return self._load_details()[field]
+
+    def __iter__(self):
+        yield from self._core
+        yield from self._load_details()
+
+    def __len__(self):
+        return len(self._core) + len(self._load_details())
+
+    def core(self):
+        return dict(self._core)
+
+class ProfileStore:
+    """Company profiles in SQLite, looked up by BSN or KvK through a bounded LRU cache"""
+
+    def __init__(self, path="profiles.db", cache_size=1024):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._kvk_to_bsn = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS profiles ("
+            " bsn TEXT PRIMARY KEY, kvk TEXT NOT NULL UNIQUE, name TEXT, company TEXT,"
+            " business_type TEXT, stage TEXT, location TEXT, employees INTEGER,"
+            " annual_revenue INTEGER, sector TEXT, details TEXT NOT NULL DEFAULT '{}')"
+        )
+
+    def subscribe(self, listener):
+        """Call ``listener(bsn)`` after each saved profile"""
+        self._listeners.append(listener)
+
+    def __contains__(self, bsn):
+        return self.get(bsn) is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+
+    def get(self, bsn):
+        """Profile for a BSN, or None"""
+        with self._lock:
+            profile = self._cache.get(bsn)
+            if profile is not None:
+                self._cache.move_to_end(bsn)
+                return profile
+
+            row = self._db.execute(
+                f"SELECT {', '.join(CORE_FIELDS)} FROM profiles WHERE bsn = ?", (bsn,)
+            ).fetchone()
+            if row is None:
+                return None
+            return self._remember(Profile(self, dict(zip(CORE_FIELDS, row))))
+
+    def get_by_kvk(self, kvk):
+        """Profile for a KvK number, or None"""
+        with self._lock:
+            bsn = self._kvk_to_bsn.get(kvk)
+            if bsn is None:
+                row = self._db.execute("SELECT bsn FROM profiles WHERE kvk = ?", (kvk,)).fetchone()
+                if row is None:
+                    return None
+                bsn = row[0]
+        return self.get(bsn)
+
+    def _remember(self, profile):
+        self._cache[profile.key] = profile
+        self._kvk_to_bsn[profile["kvk"]] = profile.key
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        if len(self._kvk_to_bsn) > self.cache_size:
+            self._kvk_to_bsn.popitem(last=False)
+        return profile
+
+    def _load_details(self, bsn):
+        with self._lock:
+            row = self._db.execute("SELECT details FROM profiles WHERE bsn = ?", (bsn,)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def save(self, profile):
+        """Insert or replace a profile given as a plain dict"""
+        core = [profile.get(field) for field in CORE_FIELDS]
+        details = {key: value for key, value in profile.items() if key not in CORE_FIELDS}
+        with self._lock:
+            old = self._cache.pop(profile["bsn"], None)
+            if old is not None:
+                self._kvk_to_bsn.pop(old["kvk"], None)
+            self._db.execute(
+                f"INSERT OR REPLACE INTO profiles ({', '.join(CORE_FIELDS)}, details)"
+                f" VALUES ({', '.join('?' * (len(CORE_FIELDS) + 1))})",
+                core + [json.dumps(details, ensure_ascii=False)],
+            )
+        for listener in self._listeners:
+            listener(profile["bsn"])
+
+    def seed(self, profiles):
+        """Save the given profiles when the store is still empty"""
+        if len(self) == 0:
+            for profile in profiles.values():
+                self.save(profile)
@@ -0,0 +1,247 @@
+import json
+import linecache
+import os
+
+import numpy as np
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules.json")
+
+# File name the compiled conditions show up under in tracebacks
+CONDITIONS_FILENAME = "<rules>"
+
+# Keyword groups are packed into one unsigned 64-bit word per program
+MAX_GROUPS = 64
+
+# Programs sampled to estimate how often each keyword occurs
+SELECTIVITY_SAMPLE = 1000
+
+# Relative cost of a condition, used to evaluate the cheap parts of "all"
+# and "any" first so they can short-circuit the expensive ones
+CONDITION_COSTS = {'equals': 1, 'between': 1, 'at_least': 1, 'contains': 3}
+
+def condition_cost(spec):
+    if spec is None:
+        return 0
+    for combinator in ('all', 'any'):
+        if combinator in spec:
+            return sum(condition_cost(part) for part in spec[combinator])
+    if 'not' in spec:
+        return condition_cost(spec['not'])
+    return next((cost for kind, cost in CONDITION_COSTS.items() if kind in spec), 1)
+
+def condition_fields(spec):
+    """(field, kind) of every comparison in a condition, kind being 'number' or 'text'"""
+    if spec is None:
+        return
+    for combinator in ('all', 'any'):
+        if combinator in spec:
+            for part in spec[combinator]:
+                yield from condition_fields(part)
+            return
+    if 'not' in spec:
+        yield from condition_fields(spec['not'])
+    elif 'contains' in spec:
+        yield spec['field'], 'text'
+    elif 'between' in spec or 'at_least' in spec:
+        yield spec['field'], 'number'
+
+def condition_source(spec, constant):
+    """Python expression over ``profile`` for a rules.json condition
+
+    Conditions are {"field": f, "equals": v}, {"field": f, "contains": [...]}
+    (case-insensitive substring), {"field": f, "between": [lo, hi]},
+    {"field": f, "at_least": v}, and {"all": [...]}, {"any": [...]} and
+    {"not": {...}} to combine them. A missing condition is always true.
+    Values from the rules never end up in the source; ``constant`` stores
+    them and returns the name to refer to them by.
+    """
+    if spec is None:
+        return "True"
+    for combinator, joiner in (('all', ' and '), ('any', ' or ')):
+        if combinator in spec:
+            parts = sorted(spec[combinator], key=condition_cost)
+            return "(" + joiner.join(condition_source(part, constant) for part in parts) + ")"
+    if 'not' in spec:
+        return f"(not {condition_source(spec['not'], constant)})"
+
+    if 'field' not in spec:
+        raise ValueError(f"condition without a field: {spec!r}")
+    field = constant(spec['field'])
+    if 'equals' in spec:
+        return f"(profile.get({field}) == {constant(spec['equals'])})"
+    if 'contains' in spec:
+        needles = [constant(needle.lower()) for needle in spec['contains']]
+        text = "(profile.get({}) or '').lower()".format(field)
+        return "(" + " or ".join(f"{needle} in {text}" for needle in needles) + ")"
+    if 'between' in spec:
+        low, high = spec['between']
+        return f"({constant(low)} <= (profile.get({field}) or 0) <= {constant(high)})"
+    if 'at_least' in spec:
+        return f"((profile.get({field}) or 0) >= {constant(spec['at_least'])})"
+    raise ValueError(f"unknown condition: {spec!r}")
+
+def compile_conditions(specs):
+    """One function returning the truth of every condition for a profile, as a tuple"""
+    constants = {}
+    def constant(value):
+        name = f"_c{len(constants)}"
+        constants[name] = value
+        return name
+    
+    source = "def conditions(profile):\n    return ({},)\n".format(
+        ", ".join(condition_source(spec, constant) for spec in specs))
+    namespace = dict(constants)
+    exec(compile(source, CONDITIONS_FILENAME, "exec"), namespace)
+    # Registered so tracebacks show the generated source line
+    linecache.cache[CONDITIONS_FILENAME] = (len(source), None, source.splitlines(True), CONDITIONS_FILENAME)
+    return namespace["conditions"]
+
+class KeywordGroup:
+    """A set of keywords matched as substrings, with its bit in the program bitsets
+
+    ``order`` is the sequence the keywords are tried in. Only whether any of
+    them occurs matters, so the most common keyword goes first and most
+    checks stop after one substring search.
+    """
+
+    def __init__(self, bit, keywords):
+        self.bit = bit
+        self.mask = 1 << bit
+        self.keywords = list(keywords)
+        self.order = tuple(self.keywords)
+
+    def matches(self, text):
+        return any(keyword in text for keyword in self.order)
+
+    def calibrate(self, texts):
+        """Try keywords in order of how many of the given texts contain them"""
+        counts = {keyword: sum(1 for text in texts if keyword in text) for keyword in self.keywords}
+        self.order = tuple(sorted(self.keywords, key=lambda keyword: -counts[keyword]))
+
+class RuleSet:
+    """Filter and score rules from rules.json, compiled for evaluation
+
+    Every keyword group gets one bit. At catalogue load ``group_bits`` checks
+    each program text once per group and stores the hits as one 64-bit word
+    per program. A filter selection then becomes a single mask: a program
+    passes when its word shares a bit with it, which is one vectorized AND
+    over the catalogue instead of keyword checks per program. The score
+    matrix is read off the same words.
+    """
+
+    def __init__(self, spec):
+        self.filter_fields = list(spec['filter_fields'])
+        self.default_filter_values = list(spec['default_filter_values'])
+        self.max_match_score = spec['max_match_score']
+        # How far semantic similarity may raise a score towards 100%; 0 turns it off
+        self.semantic_weight = spec.get('semantic_weight', 0)
+        self.groups = []
+
+        self.filters = {
+            key: [(option['trigger'], self._group(option['keywords'])) for option in options]
+            for key, options in spec['filters'].items()
+        }
+        self.score_groups = [(group['name'], self._group(group['keywords'])) for group in spec['score_groups']]
+        self.score_group_names = [name for name, _ in self.score_groups]
+        self.conditions = compile_conditions([group.get('when') for group in spec['score_groups']])
+        fields = [field for group in spec['score_groups'] for field in condition_fields(group.get('when'))]
+        self.number_fields = sorted({field for field, kind in fields if kind == 'number'})
+        self.text_fields = sorted({field for field, kind in fields if kind == 'text'})
+
+    @classmethod
+    def load(cls, path=RULES_PATH):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def _group(self, keywords):
+        if len(self.groups) == MAX_GROUPS:
+            raise ValueError(f"rules define more than {MAX_GROUPS} keyword groups")
+        group = KeywordGroup(len(self.groups), keywords)
+        self.groups.append(group)
+        return group
+
+    def filters_all_default(self, filters):
+        """True when none of the filters narrows the catalogue"""
+        return all(
+            not filters.get(key) or filters.get(key) in self.default_filter_values
+            for key in self.filter_fields
+        )
+
+    def active_filter_groups(self, filters):
+        """Keyword group of the first matching option of each set filter"""
+        groups = []
+        for key, options in self.filters.items():
+            value = (filters.get(key) or '').lower()
+            if not value:
+                continue
+            for trigger, group in options:
+                if trigger in value:
+                    groups.append(group)
+                    break
+        return groups
+
+    def filter_mask(self, filters):
+        """Bits a program needs one of to pass the filters, 0 when nothing is filtered"""
+        if not filters or self.filters_all_default(filters):
+            return 0
+        mask = 0
+        for group in self.active_filter_groups(filters):
+            mask |= group.mask
+        return mask
+
+    def clean_profile(self, profile):
+        """Copy of a profile with the fields the conditions read coerced to their type
+        
+        Numbers may arrive as strings, e.g. from a CSV; empty ones are dropped
+        as unknown. Raises ValueError for a value that is not a number.
+        """
+        cleaned = dict(profile)
+        for field in self.number_fields:
+            value = cleaned.get(field)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                cleaned.pop(field, None)
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                try:
+                    number = float(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"{field} must be a number, not {value!r}") from None
+                cleaned[field] = int(number) if number.is_integer() else number
+        for field in self.text_fields:
+            value = cleaned.get(field)
+            if value is not None and not isinstance(value, str):
+                cleaned[field] = str(value)
+        return cleaned
+
+    def profile_groups(self, profile):
+        """Names of the score groups that count for a profile"""
+        return [name for name, active in zip(self.score_group_names, self.conditions(profile)) if active]
+
+    def profile_vector(self, profile):
+        return np.array(self.conditions(profile), dtype=np.int32)
+
+    def text_score(self, text, profile):
+        """Number of score groups that count for the profile and occur in the text"""
+        score = 0
+        for (_, group), active in zip(self.score_groups, self.conditions(profile)):
+            if active and group.matches(text):
+                score += 1
+        return score
+
+    def group_bits(self, texts):
+        """One word per text with the bit of every keyword group occurring in it
+
+        Keyword order is recalibrated on a sample of the texts first, so the
+        checks here and in ``text_score`` follow the catalogue last loaded.
+        """
+        sample = texts[::max(1, len(texts) // SELECTIVITY_SAMPLE)]
+        bits = np.zeros(len(texts), dtype=np.uint64)
+        for group in self.groups:
+            group.calibrate(sample)
+            hits = np.fromiter((group.matches(text) for text in texts), dtype=bool, count=len(texts))
+            bits[hits] |= np.uint64(group.mask)
+        return bits
+
+    def score_matrix(self, bits):
+        """Programs x score-group 0/1 matrix from the group bits"""
+        shifts = np.array([group.bit for _, group in self.score_groups], dtype=np.uint64)
+        return ((bits[:, None] >> shifts) & np.uint64(1)).astype(np.int32)
@@ -2,10 +2,15 @@
 DIR="$( cd "$( dirname "${BASH_SOURCE[0]}" )" &> /dev/null && pwd )"
 
 PORT=${1:-8501}
+WORKERS=${2:-1}
 
-pkill -f streamlit 2>/dev/null
-sleep 1
+if [ "$WORKERS" -gt 1 ]; then
+    # Workers on PORT+1..PORT+WORKERS behind a sticky proxy on PORT.
+    # kill -HUP <launcher pid> restarts them one by one without downtime.
+    exec "$DIR/venv_new/bin/python" "$DIR/launcher.py" --port "$PORT" --workers "$WORKERS"
+fi
 
-"$DIR/venv_new/bin/python" -m streamlit run "$DIR/app.py" --server.port "$PORT"
+exec "$DIR/venv_new/bin/python" -m streamlit run "$DIR/app.py" --server.port "$PORT"
 
-#to run it u just need to type "./run.sh" and some port for example 8555 or something else
\ No newline at end of file
+#to run it u just need to type "./run.sh" and some port for example 8555 or something else
+#add a worker count to run several workers behind one port, for example "./run.sh 8555 4"
@@ -0,0 +1,162 @@
+import functools
+import re
+import unicodedata
+from collections import Counter
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9&]+")
+
+STOP_WORDS = frozenset("""
+aan al als bij dan dat de der des die dit door een en er het hij hun ik in is je
+kan maar met na naar niet nog of om ook op over te tot u uit van voor wat we
+wel wij worden wordt zich zij zijn
+""".split())
+
+# Search scores are rounded to this resolution for ranking, which lets one
+# sort over packed (score, document id) keys order the results
+SCORE_SCALE = 10000
+ID_BITS = 24
+
+# Fields indexed for search, with how often their tokens count
+SEARCH_FIELDS = (
+    ('short_name', 2),
+    ('long_name', 2),
+    ('description', 1),
+    ('criteria', 1),
+    ('benefits', 1),
+)
+
+def fold(text):
+    """Lowercase text with accents removed, so "privé" and "prive" match"""
+    text = text.lower()
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+@functools.lru_cache(maxsize=65536)
+def stem(token):
+    """Light Dutch stemmer for plurals and a few common endings
+
+    Enough to make "subsidies", "warmtepompen" and "bedrijven" match
+    "subsidie", "warmtepomp" and "bedrijf". Documents and queries go through
+    the same function, so consistency matters more than linguistic accuracy.
+    """
+    if len(token) <= 4 or not token.isalpha():
+        return token
+    if token.endswith('heden'):
+        return token[:-5] + 'heid'
+    if token.endswith('tjes'):
+        return token[:-4]
+    if token.endswith('en') and token[-3] not in 'aeiou':
+        token = token[:-2]
+        if len(token) > 2 and token[-1] == token[-2] and token[-1] not in 'aeiou':
+            token = token[:-1]
+        elif token.endswith('v'):
+            token = token[:-1] + 'f'
+        elif token.endswith('z'):
+            token = token[:-1] + 's'
+        return token
+    if token.endswith('s') and token[-2] not in 'sj':
+        return token[:-1]
+    return token
+
+def tokenize(text):
+    """Search terms of a text: folded, stop words dropped, stemmed"""
+    return [stem(token) for token in TOKEN_PATTERN.findall(fold(text)) if token not in STOP_WORDS]
+
+def search_tokens(program):
+    """Search terms of a program, name fields counted double"""
+    tokens = []
+    for field, weight in SEARCH_FIELDS:
+        value = program.get(field) or ''
+        if isinstance(value, list):
+            value = ' '.join(value)
+        tokens.extend(tokenize(value) * weight)
+    return tokens
+
+class SearchIndex:
+    """BM25 inverted index over tokenized documents
+
+    Postings are stored per term as a slice of two flat arrays, document ids
+    and precomputed BM25 weights. BM25 weights depend only on the term and the
+    document, so a query is a handful of vectorized additions into one score
+    array.
+    """
+
+    def __init__(self, documents, k1=1.2, b=0.75):
+        vocabulary = {}
+        terms, docs, freqs = [], [], []
+        lengths = []
+        for doc, tokens in enumerate(documents):
+            lengths.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                terms.append(vocabulary.setdefault(token, len(vocabulary)))
+                docs.append(doc)
+                freqs.append(count)
+
+        self.size = len(lengths)
+        self.vocabulary = vocabulary
+        terms = np.array(terms, dtype=np.int64)
+        docs = np.array(docs, dtype=np.int32)
+        freqs = np.array(freqs, dtype=np.float32)
+        lengths = np.array(lengths, dtype=np.float32)
+
+        # Group the postings by term; the stable sort keeps documents in order
+        order = np.argsort(terms, kind='stable')
+        terms, docs, freqs = terms[order], docs[order], freqs[order]
+        df = np.bincount(terms, minlength=len(vocabulary))
+        self.starts = np.concatenate(([0], np.cumsum(df)))
+
+        average_length = float(lengths.mean()) if self.size else 0.0
+        idf = np.log1p((self.size - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = k1 * (1 - b + b * lengths[docs] / average_length) if average_length else k1
+        self.docs = docs
+        self.freqs = freqs
+        self.weights = idf[terms] * freqs * (k1 + 1) / (freqs + norm)
+
+    def postings(self, term_id):
+        start, stop = self.starts[term_id], self.starts[term_id + 1]
+        return self.docs[start:stop], self.weights[start:stop]
+
+    def query_terms(self, query):
+        """Ids of the distinct query terms that occur in the catalogue"""
+        return list(dict.fromkeys(
+            self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary
+        ))
+
+    def search(self, query, allowed=None, limit=None):
+        """Document ids matching the query, best BM25 score first
+
+        Documents must contain every known query term; when no document does,
+        documents containing any of them are returned instead. ``allowed``
+        restricts the result to the given document ids, e.g. those passing
+        the filters. Ties keep catalogue order. Document ids must stay
+        below 2 ** ID_BITS.
+        """
+        term_ids = self.query_terms(query)
+        if not term_ids:
+            return []
+
+        scores = np.zeros(self.size, dtype=np.float32)
+        hits = np.zeros(self.size, dtype=np.int16)
+        for term_id in term_ids:
+            docs, weights = self.postings(term_id)
+            scores[docs] += weights
+            hits[docs] += 1
+
+        candidates = np.flatnonzero(hits == len(term_ids))
+        if not len(candidates):
+            candidates = np.flatnonzero(hits)
+        if allowed is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[np.asarray(allowed, dtype=np.int64)] = True
+            candidates = candidates[mask[candidates]]
+
+        # Best score first, ties in catalogue order, in one sort of unique keys
+        quantized = np.rint(scores[candidates] * SCORE_SCALE).astype(np.int64)
+        order = np.sort((-quantized << ID_BITS) | candidates) & ((1 << ID_BITS) - 1)
+        if limit:
+            order = order[:limit]
+        return order.tolist()
@@ -0,0 +1,252 @@
+import math
+from collections import Counter
+
+import numpy as np
+
+from search import tokenize
+
+# Character n-grams of every term are hashed into this many signed buckets
+HASH_DIM = 2048
+NGRAM_SIZES = (3, 4, 5)
+
+# Size of the embeddings the hashed vectors are projected to
+DIMENSIONS = 64
+
+# Documents the projection is fitted on
+SAMPLE = 4096
+
+# Catalogues below this size are searched exhaustively
+IVF_MIN_SIZE = 4096
+
+# Rows processed at once while embedding the catalogue
+CHUNK = 65536
+
+# Profile fields where a company describes what it does in its own words
+PROFILE_TEXT_FIELDS = ('activity', 'description')
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+
+def ngram_features(terms):
+    """Hashed character n-grams of terms, as (term index, bucket, signed weight) arrays
+
+    Terms are padded with a space on both sides, so "warmtenet" and
+    "warmte" share their leading n-grams and their vectors point the same
+    way even though the words differ. All n-grams are hashed at once with
+    FNV-1a over the code points, and each term's weights have unit norm.
+    The arrays are ordered by term.
+    """
+    padded = ''.join(f" {term} " for term in terms)
+    lengths = np.array([len(term) + 2 for term in terms], dtype=np.int64)
+    codes = np.frombuffer(padded.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    owner = np.repeat(np.arange(len(terms)), lengths)
+
+    owners, hashes = [], []
+    with np.errstate(over='ignore'):
+        for n in NGRAM_SIZES:
+            count = len(codes) - n + 1
+            if count <= 0:
+                continue
+            value = np.full(count, FNV_OFFSET)
+            for offset in range(n):
+                value = (value ^ codes[offset:offset + count]) * FNV_PRIME
+            # Only n-grams that do not run into the next term
+            inside = owner[:count] == owner[n - 1:n - 1 + count]
+            owners.append(owner[:count][inside])
+            hashes.append(value[inside])
+
+    if not owners:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    owners = np.concatenate(owners)
+    hashes = np.concatenate(hashes)
+    order = np.argsort(owners, kind='stable')
+    owners, hashes = owners[order], hashes[order]
+    buckets = ((hashes >> np.uint64(40)) % np.uint64(HASH_DIM)).astype(np.int64)
+    signs = np.where((hashes >> np.uint64(32)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+    counts = np.bincount(owners, minlength=len(terms))
+    return owners, buckets, signs / np.sqrt(counts[owners]).astype(np.float32)
+
+def profile_description(profile):
+    """Free text about what a company does, from whichever profile fields are set"""
+    parts = [str(profile.get(field)) for field in PROFILE_TEXT_FIELDS if profile.get(field)]
+    return ' '.join(parts)
+
+def top_components(matrix, k, iterations=4, seed=0):
+    """The k leading right singular vectors of a dense matrix, by randomized SVD"""
+    rng = np.random.default_rng(seed)
+    basis = matrix @ rng.standard_normal((matrix.shape[1], k + 8)).astype(np.float32)
+    for _ in range(iterations):
+        basis, _ = np.linalg.qr(basis)
+        basis = matrix @ (matrix.T @ basis)
+    basis, _ = np.linalg.qr(basis)
+    _, _, vt = np.linalg.svd(basis.T @ matrix, full_matrices=False)
+    return np.ascontiguousarray(vt[:k], dtype=np.float32)
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+def add_segments(result, rows, segments):
+    """Add every row into result[segment]; rows must be ordered by segment"""
+    if len(segments):
+        boundaries = np.flatnonzero(np.r_[True, segments[1:] != segments[:-1]])
+        result[segments[boundaries]] += np.add.reduceat(rows, boundaries, axis=0)
+
+class SemanticIndex:
+    """Dense text embeddings of a catalogue with an IVF nearest-neighbour index
+
+    Built from the postings of a SearchIndex, so documents are tokenized
+    once. Documents are TF-IDF weighted terms, every term spread over the
+    hashed character n-grams it contains, projected onto the leading
+    singular vectors of a sample of the catalogue (latent semantic
+    analysis): terms that look alike or occur together end up close. All of
+    it is NumPy on the CPU; no model is downloaded.
+
+    Embeddings are computed and kept in double precision, so a program
+    embedded on its own with ``embed_document`` gets the same similarities
+    as its row in the catalogue and scores agree however they are computed.
+
+    For top-k lookups the embeddings are clustered with spherical k-means
+    and stored grouped by cluster. A query only scores the programs in the
+    ``probes`` clusters nearest to it, about probes / sqrt(n) of the
+    catalogue.
+    """
+
+    def __init__(self, search, dimensions=DIMENSIONS, probes=8, seed=0):
+        self.size = search.size
+        self.probes = probes
+        self.vocabulary = search.vocabulary
+
+        # Postings come grouped by term; regroup them by document
+        df = np.diff(search.starts)
+        terms = np.repeat(np.arange(len(df)), df)
+        order = np.argsort(search.docs, kind='stable')
+        docs, terms = search.docs[order].astype(np.int64), terms[order]
+        self.idf = (np.log((1 + self.size) / (1 + df)) + 1).astype(np.float32)
+        self.unknown_idf = np.float32(math.log(1 + self.size) + 1)
+        weights = (1 + np.log(search.freqs[order])) * self.idf[terms]
+
+        owners, self.buckets, self.values = ngram_features(list(self.vocabulary))
+        self.feature_starts = np.concatenate(([0], np.cumsum(np.bincount(owners, minlength=len(df)))))
+
+        # Projection fitted on an even sample of the documents
+        step = max(1, self.size // SAMPLE)
+        sampled = np.flatnonzero(docs % step == 0)
+        sample = self._hashed(docs[sampled] // step, terms[sampled], weights[sampled], -(-self.size // step))
+        self.components = top_components(sample, min(dimensions, *sample.shape)).astype(np.float64)
+
+        # Every vocabulary term embedded from its n-grams, then every
+        # document as the weighted sum of its terms
+        projected = self.components.T
+        term_vectors = np.zeros((len(df), len(self.components)))
+        for start in range(0, len(owners), CHUNK):
+            chunk = slice(start, start + CHUNK)
+            add_segments(term_vectors, self.values[chunk, None] * projected[self.buckets[chunk]], owners[chunk])
+
+        vectors = np.zeros((self.size, len(self.components)))
+        for start in range(0, len(docs), CHUNK):
+            chunk = slice(start, start + CHUNK)
+            add_segments(vectors, weights[chunk, None] * term_vectors[terms[chunk]], docs[chunk])
+        self.vectors = normalize_rows(vectors)
+
+        self._build_clusters(seed)
+
+    def _hashed(self, rows, terms, weights, n_rows):
+        """Dense rows x HASH_DIM matrix of weighted term n-gram features"""
+        starts = self.feature_starts[terms]
+        counts = self.feature_starts[terms + 1] - starts
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        features = np.repeat(starts, counts) + offsets
+        flat = np.repeat(rows, counts) * HASH_DIM + self.buckets[features]
+        matrix = np.bincount(flat, np.repeat(weights, counts) * self.values[features], minlength=n_rows * HASH_DIM)
+        return matrix.reshape(n_rows, HASH_DIM).astype(np.float32)
+
+    def _build_clusters(self, seed, iterations=8):
+        """Spherical k-means over a sample, then every vector into its nearest cluster"""
+        if self.size < IVF_MIN_SIZE:
+            self.centroids = None
+            return
+        rng = np.random.default_rng(seed)
+        n_clusters = int(math.sqrt(self.size))
+        training = self.vectors[rng.choice(self.size, min(self.size, 32 * n_clusters), replace=False)]
+        centroids = training[rng.choice(len(training), n_clusters, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(training @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, training)
+            moved = np.bincount(assignment, minlength=n_clusters) > 0
+            centroids[moved] = normalize_rows(sums[moved])
+
+        assignment = np.concatenate([
+            np.argmax(self.vectors[start:start + CHUNK] @ centroids.T, axis=1)
+            for start in range(0, self.size, CHUNK)
+        ])
+        self.centroids = centroids
+        self.members = np.argsort(assignment, kind='stable')
+        self.starts = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=n_clusters))))
+
+    def _hashed_terms(self, counts):
+        """Hashed vector of term counts, weighted as the catalogue documents are"""
+        terms = list(counts)
+        tf = 1 + np.log(np.array([counts[term] for term in terms], dtype=np.float32))
+        idf = np.array([
+            self.idf[self.vocabulary[term]] if term in self.vocabulary else self.unknown_idf for term in terms
+        ], dtype=np.float32)
+        owners, buckets, values = ngram_features(terms)
+        return np.bincount(buckets, (tf * idf).astype(np.float64)[owners] * values, minlength=HASH_DIM)
+
+    def embed(self, text):
+        """Vector of a free text in the catalogue's embedding space
+
+        It is scaled by the norm of the hashed vector rather than its own, so
+        its length is the share of the text the catalogue's projection can
+        represent. Text that shares nothing with the catalogue, whose
+        projection is mostly hash-collision noise, then comes out short and
+        scores low against every program instead of scoring at random.
+        """
+        counts = Counter(tokenize(text))
+        if not counts:
+            return np.zeros(len(self.components))
+        vector = self._hashed_terms(counts)
+        norm = np.linalg.norm(vector)
+        return self.components @ (vector / norm) if norm else np.zeros(len(self.components))
+
+    def embed_document(self, tokens):
+        """Unit vector of a tokenized program, as its row would be in the catalogue"""
+        counts = Counter(tokens)
+        if not counts:
+            return np.zeros(len(self.components))
+        return normalize_rows((self.components @ self._hashed_terms(counts))[None, :])[0]
+
+    def similarities(self, vectors, rows=None):
+        """Programs x vectors cosine similarity, clipped to [0, 1]"""
+        programs = self.vectors if rows is None else self.vectors[rows]
+        return np.clip(programs @ np.asarray(vectors, dtype=np.float64).T, 0, 1)
+
+    def candidates(self, vector):
+        """Program ids in the clusters nearest to a vector, or every id for a small catalogue"""
+        if self.centroids is None:
+            return np.arange(self.size)
+        probes = min(self.probes, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ vector), probes - 1)[:probes]
+        return np.concatenate([self.members[self.starts[c]:self.starts[c + 1]] for c in nearest])
+
+    def search(self, vector, k=10, allowed=None, min_similarity=0.0):
+        """Approximately the k programs most similar to a vector, as (ids, similarities), best first
+
+        ``allowed`` restricts the result to the given program ids. Ties keep
+        catalogue order.
+        """
+        ids = self.candidates(vector)
+        if allowed is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[np.asarray(allowed, dtype=np.int64)] = True
+            ids = ids[mask[ids]]
+        scores = self.vectors[ids] @ vector
+        keep = scores >= min_similarity
+        ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.lexsort((ids, -scores))
+        return ids[order], scores[order]
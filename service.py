@@ -0,0 +1,206 @@
+import argparse
+import asyncio
+import json
+import sys
+import traceback
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlsplit
+
+from matching import MatchingEngine, clean_profile
+
+MAX_BODY_BYTES = 1 << 20
+
+# Program fields the scoring reads, by the type they must have
+PROGRAM_TEXT_FIELDS = ("short_name", "long_name", "description")
+PROGRAM_LIST_FIELDS = ("criteria", "benefits")
+
+def check_filters(filters):
+    """TypeError unless every filter value is a string or null"""
+    for key, value in filters.items():
+        if value is not None and not isinstance(value, str):
+            raise TypeError(f"filter {key} must be a string or null")
+
+def check_programs(programs):
+    """TypeError unless programs is a list of objects whose text fields can be scored"""
+    if not isinstance(programs, list) or not all(isinstance(program, dict) for program in programs):
+        raise TypeError("programs must be a list of objects")
+    for program in programs:
+        for field in PROGRAM_TEXT_FIELDS:
+            if not isinstance(program.get(field, ""), str):
+                raise TypeError(f"program {field} must be a string")
+        for field in PROGRAM_LIST_FIELDS:
+            value = program.get(field, [])
+            if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+                raise TypeError(f"program {field} must be a list of strings")
+
+class MatchBatcher:
+    """Groups concurrent match requests into batches for MatchingEngine.match_many
+
+    One batch runs in a worker thread at a time. Requests arriving while it
+    runs are queued and all go into the next batch, so batches grow with load
+    and the event loop never blocks on scoring. When a batch fails, its
+    requests are retried one by one, so only the failing request gets the
+    error.
+    """
+
+    def __init__(self, engine, max_batch=256):
+        self.engine = engine
+        self.max_batch = max_batch
+        self._queue = []
+        self._running = False
+        self._task = None
+
+    async def match(self, profile, filters, limit):
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append(((profile, filters, limit), future))
+        if not self._running:
+            self._running = True
+            self._task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._queue:
+                batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+                try:
+                    responses = await loop.run_in_executor(None, self.engine.match_many, [request for request, _ in batch])
+                except Exception:
+                    responses = await loop.run_in_executor(None, self._match_each, [request for request, _ in batch])
+                for (_, future), response in zip(batch, responses):
+                    if future.done():
+                        continue
+                    if isinstance(response, Exception):
+                        future.set_exception(response)
+                    else:
+                        future.set_result(response)
+        finally:
+            self._running = False
+
+    def _match_each(self, requests):
+        """Response or exception of each request, matched on its own"""
+        results = []
+        for request in requests:
+            try:
+                results.append(self.engine.match_many([request])[0])
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+class MatchService:
+    """Minimal HTTP/1.1 JSON service around the matching engine
+
+    POST /match    {"profile": {...}, "filters": {...}, "limit": 10}
+    POST /score    {"profile": {...}, "programs": [{...}, ...]}
+    GET  /autocomplete?q=wbs&limit=8
+    GET  /health
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.batcher = MatchBatcher(engine)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": "request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version.strip() == "HTTP/1.1"
+                try:
+                    status, payload = await self.dispatch(method, path, body)
+                except Exception:
+                    traceback.print_exc(file=sys.stderr)
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body):
+        url = urlsplit(path)
+        path = url.path
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, {"status": "ok", "catalogue_version": self.engine.store.current().version}
+        if path == "/autocomplete":
+            if method != "GET":
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use GET"}
+            params = parse_qs(url.query)
+            try:
+                limit = min(50, max(0, int(params.get("limit", ["8"])[0])))
+            except ValueError as exc:
+                return HTTPStatus.BAD_REQUEST, {"error": f"invalid request: {exc}"}
+            # A trie lookup is cheap enough to answer on the event loop
+            return HTTPStatus.OK, self.engine.autocomplete(params.get("q", [""])[0], limit)
+        if path not in ("/match", "/score"):
+            return HTTPStatus.NOT_FOUND, {"error": "not found"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "use POST"}
+
+        try:
+            request = json.loads(body or b"{}")
+            profile = request["profile"]
+            filters = request.get("filters") or {}
+            limit = max(0, int(request.get("limit", 10)))
+            if not isinstance(profile, dict) or not isinstance(filters, dict):
+                raise TypeError("profile and filters must be objects")
+            check_filters(filters)
+            profile = clean_profile(profile)
+            programs = request.get("programs", [])
+            if path == "/score":
+                check_programs(programs)
+        except (ValueError, KeyError, TypeError) as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": f"invalid request: {exc}"}
+
+        if path == "/score":
+            scores = await asyncio.get_running_loop().run_in_executor(None, self.engine.score, profile, programs)
+            return HTTPStatus.OK, {"scores": scores}
+
+        return HTTPStatus.OK, await self.batcher.match(profile, filters, limit)
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+async def serve(host, port, catalogue_path):
+    service = MatchService(MatchingEngine.from_path(catalogue_path))
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1024)
+    print(f"Matching service listening on http://{host}:{port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve program matching over HTTP/JSON")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--catalogue", default="data.json")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.host, args.port, args.catalogue))